@@ -1,5 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { chromium } from 'playwright';
+import { chromium, Page } from 'playwright';
+// Общая с Python-ботом таблица селекторов (dom_probe.py)
+import selectorTableJson from '../../../data/selectors.json';
 
 // Настройка для Vercel: максимальное время выполнения функции
 export const maxDuration = 60;
@@ -10,6 +12,81 @@ function log(message: string, data?: any) {
   console.log(`[${timestamp}] [SCREENSHOT] ${message}`, data ? JSON.stringify(data, null, 2) : '');
 }
 
+type SelectorCandidate = { css?: string; text?: string; exact?: boolean; index: number };
+
+const selectorTable: Record<string, Omit<SelectorCandidate, 'index'>[]> = selectorTableJson;
+
+// Счетчики срабатываний селекторов: удачные проверяются первыми, пока инстанс жив
+const selectorHits: Record<string, number[]> = {};
+
+function orderedCandidates(group: string): SelectorCandidate[] {
+  const hits = (selectorHits[group] ??= selectorTable[group].map(() => 0));
+  return selectorTable[group]
+    .map((candidate, index) => ({ ...candidate, index }))
+    .sort((a, b) => hits[b.index] - hits[a.index]);
+}
+
+// Проверяет всех кандидатов одним вызовом в браузер и кликает по найденному элементу
+async function probeAndClick(page: Page, group: string, timeout = 0): Promise<boolean> {
+  const arg = { candidates: orderedCandidates(group), marker: group };
+  const probe = ({ candidates, marker }: { candidates: SelectorCandidate[]; marker: string }) => {
+    const isVisible = (el: Element) => {
+      const rect = el.getBoundingClientRect();
+      if (rect.width === 0 || rect.height === 0) return false;
+      const style = window.getComputedStyle(el);
+      return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const normalize = (text: string | null) => (text || '').replace(/\s+/g, ' ').trim().toLowerCase();
+    document.querySelectorAll(`[data-dpt-probe="${marker}"]`).forEach((el) => el.removeAttribute('data-dpt-probe'));
+    for (const c of candidates) {
+      let found: Element | null = null;
+      if (!c.css) {
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+          if (normalize(node.textContent) === c.text!.toLowerCase() && node.parentElement && isVisible(node.parentElement)) {
+            found = node.parentElement;
+            break;
+          }
+        }
+      } else {
+        let elements: NodeListOf<Element>;
+        try {
+          elements = document.querySelectorAll(c.css);
+        } catch {
+          continue;
+        }
+        for (const el of Array.from(elements)) {
+          const text = normalize(el.textContent);
+          const wanted = (c.text || '').toLowerCase();
+          const textOk = !c.text || (c.exact ? text === wanted : text.includes(wanted));
+          if (textOk && isVisible(el)) {
+            found = el;
+            break;
+          }
+        }
+      }
+      if (found) {
+        found.setAttribute('data-dpt-probe', marker);
+        return c.index + 1;
+      }
+    }
+    return 0;
+  };
+
+  let index: number;
+  try {
+    index = timeout > 0
+      ? await (await page.waitForFunction(probe, arg, { timeout, polling: 'raf' })).jsonValue()
+      : await page.evaluate(probe, arg);
+  } catch {
+    return false;
+  }
+  if (index <= 0) return false;
+  await page.click(`[data-dpt-probe="${group}"]`, { timeout: 2000 });
+  selectorHits[group][index - 1] += 1;
+  return true;
+}
+
 export async function POST(request: NextRequest) {
   try {
     const { heroName, interactionToken, applicationId } = await request.json();
@@ -44,7 +121,8 @@ export async function POST(request: NextRequest) {
     const page = await browser.newPage();
     await page.setViewportSize({ width: 1920, height: 1080 });
 
-    const url = `https://dota2protracker.com/hero/${heroName.toLowerCase()}`;
+    const baseUrl = (process.env.DOTA2PROTRACKER_URL || 'https://dota2protracker.com').replace(/\/+$/, '');
+    const url = `${baseUrl}/hero/${encodeURIComponent(heroName.toLowerCase())}`;
     log('🔗 Открываю страницу', { url });
     
     try {
@@ -52,65 +130,25 @@ export async function POST(request: NextRequest) {
       log('✅ Страница загружена');
       await page.waitForTimeout(500);
 
-      // Закрываем уведомление о согласии
-      const consentSelectors = [
-        'button:has-text("Consent")',
-        'button:has-text("Accept")',
-        'button:has-text("Согласиться")',
-        'button:has-text("Принять")',
-        '[id*="consent"]',
-        '[class*="consent"]',
-        '[id*="cookie"]',
-        '[class*="cookie"]',
-      ];
-
+      // Закрываем уведомление о согласии (все селекторы проверяются за один вызов)
       log('🍪 Ищу и закрываю уведомление о согласии...');
-      let consentClosed = false;
-      for (const selector of consentSelectors) {
-        try {
-          // Пробуем кликнуть напрямую через page.click
-          await page.click(selector, { timeout: 1000 });
-          log('✅ Уведомление о согласии закрыто');
-          // Если клик прошел успешно, ждем и выходим
-          await page.waitForTimeout(300);
-          consentClosed = true;
-          break;
-        } catch {
-          // Элемент не найден или не кликабелен, продолжаем
-          continue;
-        }
-      }
-      if (!consentClosed) {
+      const consentClosed = await probeAndClick(page, 'consent').catch(() => false);
+      if (consentClosed) {
+        log('✅ Уведомление о согласии закрыто');
+        await page.waitForTimeout(300);
+      } else {
         log('⚠️ Уведомление о согласии не найдено');
       }
 
       await page.waitForTimeout(300);
 
       // Кликаем на вкладку Builds
-      const buildsTabSelectors = [
-        'button:has-text("Builds")',
-        'a:has-text("Builds")',
-        '[role="tab"]:has-text("Builds")',
-        'text="Builds"',
-      ];
-
       log('📑 Ищу и активирую вкладку Builds...');
-      let buildsTabClicked = false;
-      for (const selector of buildsTabSelectors) {
-        try {
-          // Пробуем кликнуть напрямую через page.click
-          await page.click(selector, { timeout: 1000 });
-          log('✅ Вкладка Builds активирована');
-          // Если клик прошел успешно, ждем и выходим
-          await page.waitForTimeout(500);
-          buildsTabClicked = true;
-          break;
-        } catch {
-          // Элемент не найден или не кликабелен, продолжаем
-          continue;
-        }
-      }
-      if (!buildsTabClicked) {
+      const buildsTabClicked = await probeAndClick(page, 'builds_tab', 1000).catch(() => false);
+      if (buildsTabClicked) {
+        log('✅ Вкладка Builds активирована');
+        await page.waitForTimeout(500);
+      } else {
         log('⚠️ Вкладка Builds не найдена, продолжаю...');
       }
 
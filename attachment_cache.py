@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Повторное использование уже загруженных в Discord скриншотов.
+
+После отправки файла запоминаем адрес вложения на CDN Discord и SHA-256
+изображения. Если следующий ответ - то же самое изображение (из кэша или
+после перерендера без изменений), бот отправляет embed со ссылкой на
+старое вложение вместо повторной загрузки файла.
+
+Ссылки CDN подписаны и истекают (параметр ex), поэтому запись считается
+действительной только до этого срока.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from metrics import CACHE_REQUESTS
+
+# Сколько секунд после загрузки ссылку можно переиспользовать (если в ней нет срока ex)
+ATTACHMENT_MAX_AGE = int(os.getenv("ATTACHMENT_MAX_AGE", "43200"))
+# Запас до истечения ссылки: ближе к сроку файл загружается заново (в секундах)
+EXPIRY_MARGIN = 600
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def url_expires_at(url: str) -> float | None:
+    """Срок действия подписанной ссылки CDN (параметр ex, unix-время в hex)"""
+    expires = parse_qs(urlparse(url).query).get("ex")
+    if not expires:
+        return None
+    try:
+        return int(expires[0], 16)
+    except ValueError:
+        return None
+
+
+class AttachmentCache:
+    """
+    Ключ (герой) -> ссылка на последнее загруженное вложение и хэш его содержимого.
+
+    Использование:
+        url = cache.lookup("mars", image)
+        if url is None:
+            message = await ctx.send(file=...)
+            cache.remember("mars", image, message.attachments[0].url)
+    """
+
+    def __init__(self, path: str, max_age: int = ATTACHMENT_MAX_AGE):
+        self.path = Path(path)
+        self.max_age = max_age
+        # ключ -> {"sha256", "url", "uploaded"}
+        self._entries: dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠ Не удалось прочитать кэш вложений, начинаю с пустого: {e}")
+
+    def _save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _is_valid(self, entry: dict) -> bool:
+        now = time.time()
+        if now - entry["uploaded"] > self.max_age:
+            return False
+        expires = url_expires_at(entry["url"])
+        return expires is None or now < expires - EXPIRY_MARGIN
+
+    def lookup(self, key: str, data: bytes) -> str | None:
+        """Ссылка на уже загруженное вложение с таким же содержимым или None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry["sha256"] == content_hash(data) and self._is_valid(entry):
+            CACHE_REQUESTS.inc(cache="attachments", result="hit")
+            return entry["url"]
+        CACHE_REQUESTS.inc(cache="attachments", result="miss")
+        return None
+
+    def remember(self, key: str, data: bytes, url: str):
+        """Запоминает адрес только что загруженного вложения с содержимым data"""
+        self._entries[key] = {
+            "sha256": content_hash(data),
+            "url": url,
+            "uploaded": time.time(),
+        }
+        try:
+            self._save()
+        except OSError as e:
+            print(f"⚠ Не удалось сохранить кэш вложений: {e}")
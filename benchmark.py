@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк без интернета: локальный сервер вместо dota2protracker.com и API матча.
+
+Сервер отдает страницы героев (записанные страницы из папки --pages,
+иначе шаблон data/bench/hero.html) и /players с настраиваемой задержкой.
+Бенчмарк прогоняет рендер скриншота и команду !match на нескольких уровнях
+параллельности и выводит p50/p95/p99, пропускную способность, пиковый RSS
+и число процессов Chromium. JSON-результат удобно сравнивать между версиями:
+
+    python benchmark.py --concurrency 1 2 4 --requests 20 --output bench.json
+    python benchmark.py --only match --latency-ms 50
+
+Страницу героя можно записать так: открыть https://dota2protracker.com/hero/mars,
+сохранить HTML в bench_pages/mars.html.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+from string import Template
+
+from aiohttp import web
+
+from process_memory import descendants, is_chromium, read_processes
+
+FIXTURES_DIR = Path(__file__).parent / "data" / "bench"
+DEFAULT_HEROES = ["mars", "pudge", "invoker", "axe", "lion"]
+
+# Картинка 1x1 для иконок предметов и способностей
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+)
+
+# Как часто замерять память процессов (в секундах)
+SAMPLE_INTERVAL = 0.1
+
+
+class StandInServer:
+    """Локальная замена dota2protracker.com и API матча"""
+
+    def __init__(self, pages_dir: Path | None = None, latency_ms: int = 0, page_latency_ms: int = 0):
+        self.pages_dir = pages_dir
+        self.latency = latency_ms / 1000
+        self.page_latency = page_latency_ms / 1000
+        self.template = Template((FIXTURES_DIR / "hero.html").read_text(encoding="utf-8"))
+        self._runner: web.AppRunner | None = None
+
+    async def _hero(self, request):
+        await asyncio.sleep(self.page_latency)
+        hero = request.match_info["hero"]
+        recorded = self.pages_dir / f"{hero}.html" if self.pages_dir else None
+        if recorded is not None and recorded.exists():
+            html = recorded.read_text(encoding="utf-8")
+        else:
+            html = self.template.substitute(hero=hero)
+        return web.Response(text=html, content_type="text/html")
+
+    async def _static(self, request):
+        name = request.match_info["name"]
+        if name.endswith(".png"):
+            return web.Response(body=PIXEL_PNG, content_type="image/png",
+                                headers={"Cache-Control": "max-age=86400"})
+        path = FIXTURES_DIR / Path(name).name
+        if not path.exists():
+            raise web.HTTPNotFound()
+        content_type = "text/css" if path.suffix == ".css" else "application/javascript"
+        return web.Response(text=path.read_text(encoding="utf-8"), content_type=content_type,
+                            headers={"Cache-Control": "max-age=86400"})
+
+    async def _players(self, request):
+        await asyncio.sleep(self.latency)
+        players = [
+            {
+                "name": f"Player {i}",
+                "steamid": str(76561197960265728 + i),
+                "dotabuff_url": f"https://www.dotabuff.com/players/{i}",
+            }
+            for i in range(10)
+        ]
+        return web.json_response({"status": "ok", "players": players})
+
+    async def start(self) -> str:
+        """Запускает сервер на свободном порту и возвращает его адрес"""
+        app = web.Application()
+        app.router.add_get("/hero/{hero}", self._hero)
+        app.router.add_get("/static/{name:.+}", self._static)
+        app.router.add_get("/players", self._players)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", 0).start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class ProcessSampler:
+    """Фоново замеряет пиковый RSS бота с дочерними процессами и число процессов Chromium"""
+
+    def __init__(self):
+        self.peak_rss = 0
+        self.peak_chromium = 0
+        self._task: asyncio.Task | None = None
+
+    def sample(self):
+        processes = read_processes()
+        if processes is None:
+            return
+        tree = descendants(processes, os.getpid())
+        total = processes[os.getpid()][2] + sum(processes[pid][2] for pid in tree)
+        chromium = sum(1 for pid in tree if is_chromium(processes[pid][1]))
+        self.peak_rss = max(self.peak_rss, total)
+        self.peak_chromium = max(self.peak_chromium, chromium)
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.sample()
+
+
+def percentile(samples: list[float], q: float) -> float | None:
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+async def run_level(call, concurrency: int, requests: int) -> dict:
+    """
+    Выполняет requests вызовов call(i) в concurrency потоков и считает статистику.
+    call возвращает True при успехе.
+    """
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception as e:
+                print(f"✗ Ошибка запроса {i}: {e}")
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    with ProcessSampler() as sampler:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "p50_s": percentile(latencies, 0.5),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "throughput_rps": requests / elapsed if elapsed else None,
+        "peak_rss_mb": round(sampler.peak_rss / 1024 / 1024, 1),
+        "peak_chromium_processes": sampler.peak_chromium,
+    }
+
+
+async def bench_hero(levels: list[int], requests: int, heroes: list[str]) -> list[dict]:
+    """Рендер скриншота через пул браузера на каждом уровне параллельности"""
+    from browser_pool import BrowserPool
+    from screenshot_hero import screenshot_hero_async
+
+    results = []
+    for concurrency in levels:
+        pool = BrowserPool(size=concurrency)
+        start = time.perf_counter()
+        await pool.start()
+        cold_start = time.perf_counter() - start
+
+        async def call(i):
+            async with pool.page() as page:
+                return await screenshot_hero_async(page, heroes[i % len(heroes)], 200) is not None
+
+        try:
+            result = await run_level(call, concurrency, requests)
+        finally:
+            await pool.close()
+        result["browser_start_s"] = cold_start
+        results.append(result)
+        print_result("hero", result)
+    return results
+
+
+class _BenchContext:
+    """Минимальная замена commands.Context: запоминает отправленные сообщения"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content)
+
+
+async def bench_match(levels: list[int], requests: int) -> list[dict]:
+    """Обработчик !match целиком, с форматированием ответа"""
+    import main
+
+    results = []
+    for concurrency in levels:
+        async def call(i):
+            ctx = _BenchContext()
+            await main.match_command.callback(ctx)
+            return bool(ctx.messages) and not str(ctx.messages[0]).startswith("❌")
+
+        result = await run_level(call, concurrency, requests)
+        results.append(result)
+        print_result("match", result)
+    await main.match_client.close()
+    return results
+
+
+def print_result(name: str, result: dict):
+    def ms(value):
+        return f"{value * 1000:.0f} мс" if value is not None else "-"
+    print(f"📊 {name} x{result['concurrency']}: p50 {ms(result['p50_s'])}, p95 {ms(result['p95_s'])}, "
+          f"p99 {ms(result['p99_s'])}, {result['throughput_rps']:.2f} зап/с, ошибок {result['errors']}, "
+          f"RSS {result['peak_rss_mb']} МБ, Chromium {result['peak_chromium_processes']}")
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    server = StandInServer(args.pages, args.latency_ms, args.page_latency_ms)
+    base_url = await server.start()
+    print(f"✓ Локальный сервер запущен: {base_url}")
+    # Модули бота читают адреса при импорте, поэтому задаем их до импорта
+    os.environ["DOTA2PROTRACKER_URL"] = base_url
+    os.environ["MATCH_API_URL"] = f"{base_url}/players"
+    if args.match_ttl is not None:
+        os.environ["MATCH_CACHE_TTL"] = str(args.match_ttl)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "latency_ms": args.latency_ms,
+            "page_latency_ms": args.page_latency_ms,
+            "match_cache_ttl": os.getenv("MATCH_CACHE_TTL"),
+            "heroes": args.heroes,
+        },
+        "results": {},
+    }
+    try:
+        if args.only in (None, "hero"):
+            report["results"]["hero"] = await bench_hero(args.concurrency, args.requests, args.heroes)
+        if args.only in (None, "match"):
+            report["results"]["match"] = await bench_match(args.concurrency, args.requests)
+    finally:
+        await server.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк рендера и !match на локальном сервере")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4],
+                        help="Уровни параллельности")
+    parser.add_argument("--requests", type=int, default=20, help="Запросов на каждый уровень")
+    parser.add_argument("--latency-ms", type=int, default=50, help="Задержка ответа /players")
+    parser.add_argument("--page-latency-ms", type=int, default=0, help="Задержка ответа страницы героя")
+    parser.add_argument("--match-ttl", type=float, default=None,
+                        help="MATCH_CACHE_TTL для прогона (0 - каждый запрос идет на сервер)")
+    parser.add_argument("--heroes", nargs="+", default=DEFAULT_HEROES, help="Герои для рендера")
+    parser.add_argument("--pages", type=Path, default=Path("bench_pages"),
+                        help="Папка с записанными страницами <герой>.html")
+    parser.add_argument("--only", choices=["hero", "match"], help="Запустить только один сценарий")
+    parser.add_argument("--output", type=Path, help="Файл для JSON-результата (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+        print(f"✓ Результат сохранен в {args.output}")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
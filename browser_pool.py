@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Пул «тёплого» браузера Chromium для создания скриншотов.
+
+Браузер запускается один раз на весь процесс бота, а запросы берут из пула
+готовые контексты со страницами и возвращают их обратно после работы.
+
+Память Chromium растет с каждой страницей, поэтому контекст пересоздается
+после BROWSER_MAX_RENDERS рендеров, а если Chromium занял больше
+BROWSER_MAX_RSS_MB, пул дожидается окончания текущих рендеров и
+перезапускает браузер целиком.
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from request_filter import install_request_filter
+from metrics import span, BROWSER_RSS, BROWSER_PROCESSES, BROWSER_LIMITS, BROWSER_RECYCLES
+from process_memory import chromium_usage
+
+# Количество одновременно открытых страниц в пуле
+DEFAULT_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+
+# Таймаут проверки «живости» страницы перед выдачей из пула (в секундах)
+HEALTH_CHECK_TIMEOUT = 2.0
+
+VIEWPORT = {"width": 1920, "height": 1080}
+
+# Сколько рендеров выполняет один контекст, прежде чем его пересоздать (0 - без ограничения)
+BROWSER_MAX_RENDERS = int(os.getenv("BROWSER_MAX_RENDERS", "50"))
+# Порог памяти Chromium в мегабайтах, после которого браузер перезапускается (0 - без ограничения)
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "600"))
+# Как часто проверять память Chromium (в секундах)
+BROWSER_MEMORY_CHECK_INTERVAL = float(os.getenv("BROWSER_MEMORY_CHECK_INTERVAL", "5"))
+# Минимальный интервал между перезапусками по памяти - защита от перезапуска по кругу,
+# если даже свежий браузер не укладывается в лимит (в секундах)
+BROWSER_RESTART_COOLDOWN = 60
+# Флаги запуска Chromium для экономии памяти (BROWSER_LOW_MEMORY=0 - выключить)
+BROWSER_LOW_MEMORY = os.getenv("BROWSER_LOW_MEMORY", "1") != "0"
+# Лимит JS-кучи страницы в мегабайтах
+BROWSER_JS_HEAP_MB = int(os.getenv("BROWSER_JS_HEAP_MB", "256"))
+
+
+def low_memory_args(pool_size: int) -> list[str]:
+    """Флаги Chromium для контейнера с ограниченной памятью"""
+    return [
+        # /dev/shm в Docker всего 64 МБ - используем /tmp
+        "--disable-dev-shm-usage",
+        "--disable-gpu",
+        "--disable-extensions",
+        "--disable-background-networking",
+        "--disable-component-update",
+        "--disable-default-apps",
+        "--mute-audio",
+        "--no-first-run",
+        # Без изоляции сайтов по процессам renderer-процессов меньше
+        "--disable-site-isolation-trials",
+        f"--renderer-process-limit={pool_size + 1}",
+        f"--js-flags=--max-old-space-size={BROWSER_JS_HEAP_MB}",
+    ]
+
+
+class PageSlot:
+    """Контекст браузера с открытой страницей, который выдаётся из пула"""
+
+    def __init__(self, context, page, generation: int):
+        self.context = context
+        self.page = page
+        # Номер запуска браузера, которому принадлежит контекст
+        self.generation = generation
+        self.broken = False
+        # Сколько рендеров выполнено в этом контексте
+        self.renders = 0
+
+    async def close(self):
+        try:
+            await self.context.close()
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    """
+    Долгоживущий браузер Chromium с пулом переиспользуемых страниц.
+
+    Использование:
+        pool = BrowserPool(size=2)
+        await pool.start()
+        async with pool.page() as page:
+            ...
+        await pool.close()
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, headless: bool = True,
+                 max_renders: int = BROWSER_MAX_RENDERS, max_rss_mb: int = BROWSER_MAX_RSS_MB):
+        self.size = max(1, size)
+        self.headless = headless
+        self.max_renders = max_renders
+        self.max_rss = max_rss_mb * 1024 * 1024
+        BROWSER_LIMITS.set(max_renders, limit="renders_per_context")
+        BROWSER_LIMITS.set(self.max_rss, limit="rss_bytes")
+        # Сколько страниц сейчас выдано и когда последний раз проверялась память
+        self._in_use = 0
+        self._last_memory_check = 0.0
+        self._last_restart = float("-inf")
+        # Сброшено, пока пул ждет окончания рендеров перед перезапуском браузера
+        self._accepting = asyncio.Event()
+        self._accepting.set()
+        self._restart_pending = False
+        self._playwright = None
+        self._browser = None
+        self._generation = 0
+        self._closing = False
+        self._lock = asyncio.Lock()
+        # Пакеты занимают места по одному - без общей блокировки два пакета
+        # могли бы взять часть мест каждый и ждать друг друга бесконечно
+        self._batch_lock = asyncio.Lock()
+        # В очереди лежат готовые слоты или None (свободное место под новый слот)
+        self._slots: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.size):
+            self._slots.put_nowait(None)
+
+    @property
+    def is_running(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    @property
+    def idle(self) -> int:
+        """Количество свободных мест в пуле"""
+        return self._slots.qsize()
+
+    async def start(self):
+        """Запускает браузер (повторный вызов ничего не делает)"""
+        self._closing = False
+        await self._ensure_browser()
+
+    async def _ensure_browser(self):
+        async with self._lock:
+            if self.is_running:
+                return
+            if self._browser is not None:
+                print("⚠ Chromium недоступен, перезапускаю браузер...")
+            await self._launch()
+
+    async def _launch(self):
+        with span("browser_launch"):
+            await self._start_browser()
+        print(f"✓ Chromium запущен (пул на {self.size} стр.)")
+
+    async def _start_browser(self):
+        # Playwright импортируется только при запуске браузера - импорт бота остается быстрым
+        from playwright.async_api import async_playwright
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        args = low_memory_args(self.size) if BROWSER_LOW_MEMORY else []
+        try:
+            browser = await self._playwright.chromium.launch(headless=self.headless, args=args)
+        except Exception:
+            # Драйвер Playwright мог упасть вместе с браузером - пересоздаём его
+            await self._stop_playwright()
+            self._playwright = await async_playwright().start()
+            browser = await self._playwright.chromium.launch(headless=self.headless, args=args)
+        browser.on("disconnected", self._on_disconnected)
+        self._browser = browser
+        self._generation += 1
+
+    def _on_disconnected(self, browser):
+        if self._closing or browser is not self._browser:
+            return
+        print("⚠ Chromium отключился, перезапускаю...")
+        BROWSER_RECYCLES.inc(target="browser", reason="crash")
+        asyncio.get_running_loop().create_task(self._relaunch_quietly())
+
+    async def _relaunch_quietly(self):
+        try:
+            await self._ensure_browser()
+        except Exception as e:
+            print(f"✗ Не удалось перезапустить Chromium: {e}")
+
+    async def _new_context(self):
+        await self._ensure_browser()
+        # Service worker'ы отключены, чтобы все запросы проходили через фильтр
+        return await self._browser.new_context(viewport=VIEWPORT, service_workers="block")
+
+    async def _new_page(self, context):
+        page = await context.new_page()
+        await install_request_filter(page)
+        return page
+
+    async def _new_slot(self) -> PageSlot:
+        context = await self._new_context()
+        page = await self._new_page(context)
+        slot = PageSlot(context, page, self._generation)
+        # Упавшая вкладка не должна вернуться в пул
+        page.on("crash", lambda _: self._on_page_crash(slot))
+        return slot
+
+    def _on_page_crash(self, slot: PageSlot):
+        print("⚠ Вкладка Chromium упала, контекст будет пересоздан")
+        slot.broken = True
+        BROWSER_RECYCLES.inc(target="context", reason="crash")
+
+    async def _is_healthy(self, slot: PageSlot) -> bool:
+        if slot.broken or slot.generation != self._generation or not self.is_running:
+            return False
+        if slot.page.is_closed():
+            return False
+        try:
+            await asyncio.wait_for(slot.page.evaluate("1"), HEALTH_CHECK_TIMEOUT)
+        except Exception:
+            return False
+        return True
+
+    async def _acquire(self) -> PageSlot:
+        # Во время перезапуска браузера новые рендеры ждут
+        await self._accepting.wait()
+        slot = await self._slots.get()
+        self._in_use += 1
+        try:
+            if slot is not None and not await self._is_healthy(slot):
+                await slot.close()
+                slot = None
+            if slot is None:
+                slot = await self._new_slot()
+            return slot
+        except BaseException:
+            # Возвращаем место в пул, чтобы не терять ёмкость
+            self._slots.put_nowait(None)
+            self._in_use -= 1
+            raise
+
+    async def _release(self, slot: PageSlot):
+        slot.renders += 1
+        if not slot.broken and self.max_renders and slot.renders >= self.max_renders:
+            print(f"♻ Контекст выполнил {slot.renders} рендеров, пересоздаю")
+            BROWSER_RECYCLES.inc(target="context", reason="renders")
+            slot.broken = True
+        if slot.broken or self._closing:
+            await slot.close()
+            slot = None
+        self._slots.put_nowait(slot)
+        self._in_use -= 1
+        await self._after_release()
+
+    async def _after_release(self):
+        if not self._restart_pending:
+            await self.check_memory()
+        if self._restart_pending and self._in_use == 0:
+            await self._restart()
+
+    async def check_memory(self, force: bool = False) -> int | None:
+        """
+        Замеряет память Chromium (не чаще BROWSER_MEMORY_CHECK_INTERVAL) и при
+        превышении лимита планирует перезапуск браузера.
+
+        Returns:
+            Память (PSS) процессов Chromium в байтах или None, если замер недоступен
+        """
+        now = time.monotonic()
+        if not force and now - self._last_memory_check < BROWSER_MEMORY_CHECK_INTERVAL:
+            return None
+        self._last_memory_check = now
+        # Обход /proc и smaps_rollup всех процессов Chromium - в отдельном потоке,
+        # чтобы не задерживать цикл событий (heartbeat Discord и другие рендеры)
+        usage = await asyncio.to_thread(chromium_usage)
+        if usage is None:
+            return None
+        rss, processes = usage
+        BROWSER_RSS.set(rss)
+        BROWSER_PROCESSES.set(processes)
+        cooling_down = now - self._last_restart < BROWSER_RESTART_COOLDOWN
+        if self.max_rss and rss > self.max_rss and not self._restart_pending and not cooling_down:
+            print(f"⚠ Chromium занимает {rss // 1024 // 1024} МБ (лимит {self.max_rss // 1024 // 1024} МБ), "
+                  f"перезапуск после текущих рендеров")
+            self._restart_pending = True
+            self._accepting.clear()
+        return rss
+
+    async def _restart(self):
+        """Перезапускает браузер, когда все выданные страницы вернулись в пул"""
+        BROWSER_RECYCLES.inc(target="browser", reason="memory")
+        try:
+            async with self._lock:
+                await self._drain_slots()
+                browser, self._browser = self._browser, None
+                if browser is not None:
+                    try:
+                        await browser.close()
+                    except Exception:
+                        pass
+            await self._ensure_browser()
+            await self.check_memory(force=True)
+        except Exception as e:
+            print(f"✗ Не удалось перезапустить Chromium: {e}")
+        finally:
+            self._last_restart = time.monotonic()
+            self._restart_pending = False
+            self._accepting.set()
+
+    async def _drain_slots(self):
+        """Закрывает свободные слоты, оставляя на их месте пустые места"""
+        drained = 0
+        while not self._slots.empty():
+            slot = self._slots.get_nowait()
+            drained += 1
+            if slot is not None:
+                await slot.close()
+        for _ in range(drained):
+            self._slots.put_nowait(None)
+
+    @asynccontextmanager
+    async def page(self):
+        """Берёт страницу из пула и возвращает её обратно после использования"""
+        with span("acquire_page"):
+            slot = await self._acquire()
+        try:
+            yield slot.page
+        except BaseException:
+            # После ошибки состояние страницы неизвестно - пересоздадим её
+            slot.broken = True
+            raise
+        finally:
+            await self._release(slot)
+
+    async def _reserve(self, count: int) -> int:
+        """Занимает count мест пула под пакет; страницы занятых слотов закрываются"""
+        await self._accepting.wait()
+        reserved = 0
+        try:
+            async with self._batch_lock:
+                while reserved < count:
+                    slot = await self._slots.get()
+                    self._in_use += 1
+                    reserved += 1
+                    if slot is not None:
+                        # Место уходит под страницу пакета - не держим рядом лишнюю
+                        await slot.close()
+        except BaseException:
+            self._unreserve(reserved)
+            raise
+        return reserved
+
+    def _unreserve(self, count: int):
+        for _ in range(count):
+            self._slots.put_nowait(None)
+        self._in_use -= count
+
+    @asynccontextmanager
+    async def pages(self, count: int):
+        """
+        Открывает отдельный контекст с несколькими страницами для пакетного рендера.
+        Страницы делят cookies, поэтому уведомление о согласии закрывается один раз.
+
+        Страниц не больше размера пула: пакет занимает столько же мест, сколько
+        открывает страниц, поэтому общий лимит страниц не превышается. Если
+        героев больше, вызывающий рендерит их по очереди на этих страницах.
+        Контекст закрывается после использования и в пул не возвращается.
+        """
+        with span("acquire_page"):
+            reserved = await self._reserve(min(max(1, count), self.size))
+        try:
+            context = await self._new_context()
+            try:
+                yield [await self._new_page(context) for _ in range(reserved)]
+            finally:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+        finally:
+            self._unreserve(reserved)
+            await self._after_release()
+
+    async def close(self):
+        """Закрывает все страницы, браузер и драйвер Playwright"""
+        self._closing = True
+        await self._drain_slots()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+            self._browser = None
+        await self._stop_playwright()
+
+    async def _stop_playwright(self):
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Разбор вкладки Builds dota2protracker.com в структурированные данные.
+
+Работает с HTML (сохраненной страницей или outerHTML контейнера, полученным
+через Playwright) и не требует браузера:
+
+    python builds_parser.py saved_page.html mars
+"""
+
+import json
+import re
+import sys
+from dataclasses import asdict, dataclass, field
+from html.parser import HTMLParser
+
+# Классы контейнера со списком билдов
+BUILDS_CONTAINER_CLASSES = {"flex", "flex-col", "gap-1"}
+
+# Теги без закрывающей пары
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# Признаки картинок способностей и предметов в адресе картинки
+ABILITY_MARKERS = ("/abilities/", "/spellicons/", "/skills/", "ability")
+ITEM_MARKERS = ("/items/", "item")
+
+PERCENT_RE = re.compile(r"(\d{1,3}(?:[.,]\d+)?)\s*%")
+MATCHES_RE = re.compile(r"(\d[\d\s,.]*)\s*(k|к)?\s*(?:matches|games|матч|игр)", re.IGNORECASE)
+
+
+@dataclass
+class BuildVariant:
+    """Один вариант билда: предметы, порядок способностей и статистика"""
+    items: list[str] = field(default_factory=list)
+    skills: list[str] = field(default_factory=list)
+    win_rate: float | None = None
+    matches: int | None = None
+
+
+@dataclass
+class HeroBuilds:
+    """Билды героя с вкладки Builds"""
+    hero: str
+    builds: list[BuildVariant] = field(default_factory=list)
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self), ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "HeroBuilds":
+        raw = json.loads(data)
+        return cls(hero=raw["hero"], builds=[BuildVariant(**b) for b in raw["builds"]])
+
+
+def _parse_matches(text: str) -> int | None:
+    match = MATCHES_RE.search(text)
+    if not match:
+        return None
+    digits = re.sub(r"[\s,]", "", match.group(1))
+    try:
+        value = float(digits) if match.group(2) else int(digits.replace(".", ""))
+    except ValueError:
+        return None
+    return int(value * 1000) if match.group(2) else int(value)
+
+
+class _BuildsHTMLParser(HTMLParser):
+    """Собирает картинки и текст из каждой строки контейнера билдов"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.depth = 0
+        self.container_depth = None
+        self.rows: list[dict] = []
+        self._done = False
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        attrs = dict(attrs)
+        if tag == "img":
+            self._handle_image(attrs)
+            return
+        if tag in VOID_TAGS:
+            return
+        self.depth += 1
+        classes = set((attrs.get("class") or "").split())
+        if self.container_depth is None and BUILDS_CONTAINER_CLASSES <= classes:
+            self.container_depth = self.depth
+        elif self.container_depth is not None and self.depth == self.container_depth + 1:
+            # Каждый прямой потомок контейнера - отдельная строка билда
+            self.rows.append({"images": [], "text": []})
+
+    def handle_endtag(self, tag):
+        if self._done or tag in VOID_TAGS:
+            return
+        if self.container_depth is not None and self.depth == self.container_depth:
+            self._done = True
+        self.depth -= 1
+
+    def handle_data(self, data):
+        if self._done or not self.rows:
+            return
+        text = data.strip()
+        if text and self.depth > self.container_depth:
+            self.rows[-1]["text"].append(text)
+
+    def _handle_image(self, attrs):
+        if self._done or not self.rows or self.depth <= self.container_depth:
+            return
+        name = (attrs.get("alt") or attrs.get("title") or "").strip()
+        if name:
+            self.rows[-1]["images"].append((name, (attrs.get("src") or "").lower()))
+
+
+def _row_to_build(row: dict) -> BuildVariant | None:
+    build = BuildVariant()
+    for name, src in row["images"]:
+        if any(marker in src for marker in ABILITY_MARKERS):
+            build.skills.append(name)
+        elif any(marker in src for marker in ITEM_MARKERS):
+            build.items.append(name)
+    text = " ".join(row["text"])
+    percent = PERCENT_RE.search(text)
+    if percent:
+        build.win_rate = float(percent.group(1).replace(",", "."))
+    build.matches = _parse_matches(text)
+    if not build.items and not build.skills:
+        return None
+    return build
+
+
+def parse_builds_html(html: str, hero: str) -> HeroBuilds:
+    """
+    Извлекает билды из HTML вкладки Builds.
+
+    Args:
+        html: HTML страницы целиком или только контейнера билдов
+        hero: Название героя
+
+    Returns:
+        HeroBuilds (список билдов пуст, если контейнер не найден)
+    """
+    parser = _BuildsHTMLParser()
+    parser.feed(html)
+    parser.close()
+    builds = [b for b in (_row_to_build(row) for row in parser.rows) if b is not None]
+    return HeroBuilds(hero=hero, builds=builds)
+
+
+def main():
+    if len(sys.argv) < 3:
+        print("Использование: python builds_parser.py <файл.html> <герой>")
+        sys.exit(1)
+    with open(sys.argv[1], encoding="utf-8") as f:
+        result = parse_builds_html(f.read(), sys.argv[2])
+    print(json.dumps(asdict(result), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+// Имитация клиентского рендера: вкладка Builds дорисовывается с задержкой
+function showBuilds() {
+  setTimeout(function () {
+    var content = document.getElementById('content');
+    content.appendChild(document.getElementById('builds').content.cloneNode(true));
+  }, 150);
+}
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Поиск элементов страницы (кнопка согласия, вкладка Builds) за один вызов.
+
+Вместо перебора селекторов с is_visible(timeout=1000) по одному все
+кандидаты проверяются одним page.evaluate прямо в браузере. Найденный
+элемент помечается атрибутом, по которому делается один клик. Селекторы,
+которые срабатывали раньше, проверяются первыми.
+
+Таблица селекторов лежит в data/selectors.json и используется также
+Next.js-версией (app/api/screenshot/route.ts).
+"""
+
+import json
+import os
+from pathlib import Path
+
+SELECTORS_FILE = os.getenv("SELECTORS_FILE", str(Path(__file__).parent / "data" / "selectors.json"))
+
+# Атрибут, которым помечается найденный элемент
+PROBE_ATTRIBUTE = "data-dpt-probe"
+
+# Функция выполняется в браузере: возвращает индекс сработавшего кандидата или -1
+PROBE_SCRIPT = """({ candidates, marker, attribute }) => {
+    const isVisible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return false;
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const normalize = (text) => (text || '').replace(/\\s+/g, ' ').trim().toLowerCase();
+    const matchesText = (el, c) => {
+        if (!c.text) return true;
+        const text = normalize(el.textContent);
+        const wanted = c.text.toLowerCase();
+        return c.exact ? text === wanted : text.includes(wanted);
+    };
+    const findByText = (c) => {
+        // Точное совпадение текста без CSS: обходим только текстовые узлы
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        const wanted = c.text.toLowerCase();
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            if (normalize(node.data) === wanted && node.parentElement && isVisible(node.parentElement)) {
+                return node.parentElement;
+            }
+        }
+        return null;
+    };
+
+    document.querySelectorAll(`[${attribute}="${marker}"]`).forEach((el) => el.removeAttribute(attribute));
+    for (const c of candidates) {
+        let found = null;
+        if (!c.css) {
+            found = findByText(c);
+        } else {
+            let elements;
+            try {
+                elements = document.querySelectorAll(c.css);
+            } catch {
+                continue;
+            }
+            for (const el of elements) {
+                if (matchesText(el, c) && isVisible(el)) {
+                    found = el;
+                    break;
+                }
+            }
+        }
+        if (found) {
+            found.setAttribute(attribute, marker);
+            return c.index;
+        }
+    }
+    return -1;
+}"""
+
+
+class SelectorGroup:
+    """Набор селекторов-кандидатов с адаптивным порядком проверки"""
+
+    def __init__(self, name: str, candidates: list[dict]):
+        self.name = name
+        self.candidates = [dict(c, index=i) for i, c in enumerate(candidates)]
+        self.hits = [0] * len(candidates)
+
+    def ordered(self) -> list[dict]:
+        """Кандидаты в порядке убывания числа срабатываний (при равенстве - как в таблице)"""
+        return sorted(self.candidates, key=lambda c: -self.hits[c["index"]])
+
+    def record(self, index: int):
+        self.hits[index] += 1
+
+    def describe(self, index: int) -> str:
+        c = self.candidates[index]
+        return f"{c.get('css', '*')} «{c['text']}»" if c.get("text") else c["css"]
+
+
+def load_selector_groups(path: str = SELECTORS_FILE) -> dict[str, SelectorGroup]:
+    with open(path, encoding="utf-8") as f:
+        table = json.load(f)
+    return {name: SelectorGroup(name, candidates) for name, candidates in table.items()}
+
+
+# Порядок запоминается на все время работы процесса
+SELECTOR_GROUPS = load_selector_groups()
+
+
+async def probe(page, group: SelectorGroup, timeout: int = 0) -> int:
+    """
+    Ищет первый видимый элемент из группы за один вызов в браузер.
+
+    Args:
+        page: Страница Playwright (async API)
+        group: Группа селекторов
+        timeout: Сколько миллисекунд ждать появления элемента (0 - проверить один раз)
+
+    Returns:
+        Индекс сработавшего кандидата в таблице или -1
+    """
+    arg = {"candidates": group.ordered(), "marker": group.name, "attribute": PROBE_ATTRIBUTE}
+    if timeout <= 0:
+        return await page.evaluate(PROBE_SCRIPT, arg)
+    # Ждем прямо в браузере, пока функция не вернет индекс >= 0
+    wait_script = f"(arg) => {{ const i = ({PROBE_SCRIPT})(arg); return i >= 0 ? i + 1 : 0; }}"
+    try:
+        handle = await page.wait_for_function(wait_script, arg=arg, timeout=timeout, polling="raf")
+    except Exception:
+        return -1
+    return await handle.json_value() - 1
+
+
+async def probe_and_click(page, group: SelectorGroup, timeout: int = 0) -> bool:
+    """Находит элемент из группы и кликает по нему. Возвращает True при успехе"""
+    index = await probe(page, group, timeout)
+    if index < 0:
+        return False
+    await page.click(f'[{PROBE_ATTRIBUTE}="{group.name}"]', timeout=2000)
+    group.record(index)
+    print(f"✓ Сработал селектор {group.describe(index)}")
+    return True
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Локальный индекс героев Dota 2.
+
+Позволяет по пользовательскому вводу (`am`, `antimag`, `антимаг`, `Queen of Pain`)
+найти героя до того, как запускать браузер. Список героев, алиасы и русские
+названия лежат в data/heroes.json и перечитываются методом reload().
+"""
+
+import difflib
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+
+# Файл со списком героев (можно подменить свежей версией без изменения кода)
+HEROES_FILE = os.getenv("HEROES_FILE", str(Path(__file__).parent / "data" / "heroes.json"))
+
+# Минимальная схожесть для автоматического исправления опечатки
+FUZZY_CUTOFF = 0.8
+# Минимальная схожесть для подсказок «возможно, вы имели в виду»
+SUGGEST_CUTOFF = 0.6
+# Минимальная длина ввода для поиска по началу названия
+MIN_PREFIX_LENGTH = 3
+
+
+@dataclass(frozen=True)
+class Hero:
+    name: str
+    slug: str
+    aliases: tuple[str, ...] = field(default=())
+
+
+def normalize(text: str) -> str:
+    """Приводит ввод к виду для поиска: нижний регистр, только буквы и цифры"""
+    text = text.lower().replace("ё", "е")
+    return re.sub(r"[^0-9a-zа-я]+", "", text)
+
+
+class HeroIndex:
+    """Индекс героев с поиском по алиасам, началу названия и опечаткам"""
+
+    def __init__(self, heroes: list[Hero]):
+        self.heroes = heroes
+        self._by_key: dict[str, Hero] = {}
+        for hero in heroes:
+            for alias in (hero.name, hero.slug, *hero.aliases):
+                key = normalize(alias)
+                if not key:
+                    continue
+                other = self._by_key.get(key)
+                if other is not None and other != hero:
+                    print(f"⚠ Алиас '{alias}' уже занят героем {other.name}, пропускаю для {hero.name}")
+                    continue
+                self._by_key[key] = hero
+        self._keys = list(self._by_key)
+        # Кэш результатов: одни и те же герои запрашиваются постоянно
+        self.resolve = lru_cache(maxsize=1024)(self._resolve)
+
+    @classmethod
+    def load(cls, path: str = HEROES_FILE) -> "HeroIndex":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        heroes = [
+            Hero(
+                name=item["name"],
+                slug=item["slug"],
+                aliases=tuple(item.get("aliases", [])) + tuple(item.get("ru", [])),
+            )
+            for item in data
+        ]
+        print(f"✓ Загружен индекс героев: {len(heroes)} героев")
+        return cls(heroes)
+
+    def reload(self, path: str = HEROES_FILE):
+        """Перечитывает файл с героями"""
+        fresh = HeroIndex.load(path)
+        self.heroes = fresh.heroes
+        self._by_key = fresh._by_key
+        self._keys = fresh._keys
+        self.resolve = fresh.resolve
+
+    def __iter__(self):
+        return iter(self.heroes)
+
+    def __len__(self):
+        return len(self.heroes)
+
+    def _resolve(self, query: str) -> Hero | None:
+        """
+        Находит героя по пользовательскому вводу.
+
+        Порядок: точное совпадение с названием или алиасом, затем однозначное
+        совпадение по началу названия, затем исправление опечатки.
+        Возвращает None, если героя определить нельзя.
+        """
+        key = normalize(query)
+        if not key:
+            return None
+
+        hero = self._by_key.get(key)
+        if hero is not None:
+            return hero
+
+        if len(key) >= MIN_PREFIX_LENGTH:
+            matches = {self._by_key[k] for k in self._keys if k.startswith(key)}
+            if len(matches) == 1:
+                return matches.pop()
+
+        close = difflib.get_close_matches(key, self._keys, n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            return self._by_key[close[0]]
+        return None
+
+    def suggest(self, query: str, limit: int = 3) -> list[Hero]:
+        """Похожие герои для подсказки, если resolve ничего не нашел"""
+        key = normalize(query)
+        if not key:
+            return []
+        close = difflib.get_close_matches(key, self._keys, n=limit * 3, cutoff=SUGGEST_CUTOFF)
+        return list(dict.fromkeys(self._by_key[k] for k in close))[:limit]
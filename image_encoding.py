@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Перекодирование скриншотов перед отправкой в Discord.
+
+Playwright отдает PNG в полном разрешении. Здесь его можно уменьшить
+и пересжать (PNG с палитрой, WebP или JPEG), чтобы файл загружался
+в Discord в несколько раз быстрее. Для перекодирования нужен Pillow;
+без него изображение отправляется как есть в PNG.
+"""
+
+import io
+import os
+
+# Формат: png (без изменений), png8 (PNG с палитрой), webp, jpeg
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp").lower()
+# Качество для webp/jpeg (1-100)
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "90"))
+# Максимальная ширина изображения в пикселях (0 - не уменьшать)
+IMAGE_MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", "0"))
+
+# Сколько скриншотов в ряд в сетке !heroes
+IMAGE_GRID_COLUMNS = int(os.getenv("IMAGE_GRID_COLUMNS", "3"))
+
+EXTENSIONS = {"png": "png", "png8": "png", "webp": "webp", "jpeg": "jpg"}
+# Максимальная сторона изображения в WebP и JPEG
+WEBP_MAX_SIZE = 16383
+JPEG_MAX_SIZE = 65500
+MAX_SIZES = {"webp": WEBP_MAX_SIZE, "jpeg": JPEG_MAX_SIZE}
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+    if IMAGE_FORMAT != "png":
+        print("⚠ Pillow не установлен - скриншоты будут отправляться в PNG без сжатия")
+
+
+def image_extension(fmt: str = IMAGE_FORMAT) -> str:
+    """Расширение файла для выбранного формата"""
+    if Image is None or fmt not in EXTENSIONS:
+        return "png"
+    return EXTENSIONS[fmt]
+
+
+def encode_image(png_bytes: bytes, fmt: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY,
+                 max_width: int = IMAGE_MAX_WIDTH) -> bytes:
+    """
+    Пересжимает PNG-скриншот.
+
+    Args:
+        png_bytes: Исходный PNG
+        fmt: Целевой формат (png, png8, webp, jpeg)
+        quality: Качество для webp/jpeg
+        max_width: Уменьшить изображение до этой ширины (0 - не уменьшать)
+
+    Returns:
+        Байты изображения в формате image_extension(fmt)
+    """
+    if Image is None or fmt not in EXTENSIONS or (fmt == "png" and not max_width):
+        return png_bytes
+
+    try:
+        with Image.open(io.BytesIO(png_bytes)) as image:
+            image.load()
+            if max_width and image.width > max_width:
+                height = round(image.height * max_width / image.width)
+                image = image.resize((max_width, height), Image.LANCZOS)
+            # Полностраничный скриншот бывает выше лимита WebP
+            encoded = _save(_fit(image, fmt), fmt, quality)
+    except Exception as e:
+        # Готовый скриншот важнее сжатия: отправляем исходный PNG
+        # (браузеры и Discord определяют тип картинки по содержимому)
+        print(f"⚠ Не удалось пересжать изображение в {fmt}, отправляю PNG: {e}")
+        return png_bytes
+
+    print(f"✓ Изображение пересжато в {fmt}: {len(png_bytes) // 1024} КБ → {len(encoded) // 1024} КБ")
+    return encoded
+
+
+def _fit(image, fmt: str):
+    """Уменьшает изображение, если оно больше максимального размера формата"""
+    max_size = MAX_SIZES.get(fmt)
+    if max_size is None or max(image.size) <= max_size:
+        return image
+    scale = max_size / max(image.size)
+    return image.resize((int(image.width * scale), int(image.height * scale)), Image.LANCZOS)
+
+
+def _save(image, fmt: str, quality: int) -> bytes:
+    output = io.BytesIO()
+    if fmt == "png":
+        image.save(output, format="PNG", optimize=True)
+    elif fmt == "png8":
+        image.convert("RGB").quantize(colors=256).save(output, format="PNG", optimize=True)
+    elif fmt == "webp":
+        image.save(output, format="WEBP", quality=quality, method=4)
+    else:
+        image.convert("RGB").save(output, format="JPEG", quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def compose_grid(images: list[bytes], columns: int = IMAGE_GRID_COLUMNS, fmt: str = IMAGE_FORMAT,
+                 quality: int = IMAGE_QUALITY) -> bytes | None:
+    """
+    Склеивает несколько скриншотов в одно изображение-сетку.
+
+    Returns:
+        Байты изображения в формате image_extension(fmt) или None без Pillow
+    """
+    if Image is None or not images:
+        return None
+    fmt = fmt if fmt in EXTENSIONS else "png"
+    tiles = [Image.open(io.BytesIO(data)) for data in images]
+    try:
+        columns = max(1, min(columns, len(tiles)))
+        rows = (len(tiles) + columns - 1) // columns
+        cell_width = max(tile.width for tile in tiles)
+        cell_height = max(tile.height for tile in tiles)
+        grid = Image.new("RGB", (cell_width * columns, cell_height * rows), (17, 17, 17))
+        for i, tile in enumerate(tiles):
+            grid.paste(tile.convert("RGB"), ((i % columns) * cell_width, (i // columns) * cell_height))
+    finally:
+        for tile in tiles:
+            tile.close()
+
+    encoded = _save(_fit(grid, fmt), fmt, quality)
+    print(f"✓ Сетка из {len(images)} скриншотов: {len(encoded) // 1024} КБ")
+    return encoded
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+HTTP-эндпоинт Discord Interactions для slash-команд (/hero, /help_hero).
+
+Discord присылает POST с подписью Ed25519. Сервер проверяет подпись,
+сразу отвечает отложенным ответом (type 5, "бот думает...") и выполняет
+команду в фоне, а результат отправляет через webhook взаимодействия.
+Так slash-команды не требуют подключения к gateway и могут обслуживаться
+несколькими репликами за балансировщиком, у каждой свой прогретый браузер.
+
+Для проверки подписи нужен пакет PyNaCl: pip install pynacl
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+from aiohttp import web
+
+from metrics import span, record_error
+
+try:
+    from nacl.exceptions import BadSignatureError
+    from nacl.signing import VerifyKey
+except ImportError:
+    VerifyKey = None
+
+# Порт HTTP-эндпоинта взаимодействий (пусто - эндпоинт выключен)
+INTERACTIONS_PORT = int(os.getenv("INTERACTIONS_PORT", "0") or 0)
+# Адрес, на котором слушает эндпоинт (Discord должен до него достучаться)
+INTERACTIONS_HOST = os.getenv("INTERACTIONS_HOST", "0.0.0.0")
+# Public Key приложения из Discord Developer Portal
+DISCORD_PUBLIC_KEY = os.getenv("DISCORD_PUBLIC_KEY", "")
+# На сколько секунд подпись может отставать от часов сервера (защита от повторов)
+SIGNATURE_MAX_AGE = 300
+
+DISCORD_API = "https://discord.com/api/v10"
+
+# Типы взаимодействий и ответов из документации Discord
+PING = 1
+APPLICATION_COMMAND = 2
+PONG = 1
+DEFERRED_CHANNEL_MESSAGE = 5
+
+
+class InteractionReply:
+    """
+    Результат slash-команды: текст, embed'ы и (необязательно) файл.
+    on_sent(message) вызывается с JSON отправленного сообщения (например,
+    чтобы запомнить адрес загруженного вложения).
+    """
+
+    def __init__(self, content: str = "", embeds: list[dict] | None = None,
+                 file: tuple[str, bytes] | None = None, on_sent=None):
+        self.content = content
+        self.embeds = embeds or []
+        self.file = file
+        self.on_sent = on_sent
+
+
+class InteractionsServer:
+    """
+    Эндпоинт POST /interactions. handlers - словарь "имя команды" ->
+    async-функция (interaction: dict) -> InteractionReply.
+
+    Использование:
+        server = InteractionsServer({"hero": hero_interaction})
+        await server.start()
+        ...
+        await server.close()
+    """
+
+    def __init__(self, handlers: dict, public_key: str = DISCORD_PUBLIC_KEY,
+                 port: int = INTERACTIONS_PORT, host: str = INTERACTIONS_HOST):
+        self.handlers = handlers
+        self.public_key = public_key
+        self.port = port
+        self.host = host
+        self._verify_key = None
+        self._runner: web.AppRunner | None = None
+        self._session: aiohttp.ClientSession | None = None
+        # Фоновые команды, ответ на которые еще не отправлен
+        self._tasks: set[asyncio.Task] = set()
+
+    def verify(self, signature: str, timestamp: str, body: bytes) -> bool:
+        """Проверяет подпись Discord: Ed25519 от timestamp + тело запроса"""
+        try:
+            if abs(time.time() - int(timestamp)) > SIGNATURE_MAX_AGE:
+                return False
+            self._verify_key.verify(timestamp.encode() + body, bytes.fromhex(signature))
+        except (BadSignatureError, ValueError):
+            return False
+        return True
+
+    async def _handle(self, request):
+        body = await request.read()
+        signature = request.headers.get("X-Signature-Ed25519", "")
+        timestamp = request.headers.get("X-Signature-Timestamp", "")
+        if not self.verify(signature, timestamp, body):
+            return web.json_response({"error": "invalid request signature"}, status=401)
+
+        interaction = json.loads(body)
+        if interaction["type"] == PING:
+            return web.json_response({"type": PONG})
+
+        if interaction["type"] == APPLICATION_COMMAND:
+            handler = self.handlers.get(interaction["data"]["name"])
+            if handler is not None:
+                # Отвечаем сразу, а команду выполняем в фоне: у Discord лимит 3 секунды
+                task = asyncio.create_task(self._run(handler, interaction))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                return web.json_response({"type": DEFERRED_CHANNEL_MESSAGE})
+
+        return web.json_response({"error": "unknown interaction"}, status=400)
+
+    async def _run(self, handler, interaction: dict):
+        command = interaction["data"]["name"]
+        try:
+            reply = await handler(interaction)
+        except Exception as e:
+            record_error(f"interaction_{command}", e)
+            print(f"✗ Ошибка slash-команды /{command}: {e}")
+            reply = InteractionReply(f"❌ Произошла ошибка: `{str(e)[:200]}`")
+        try:
+            with span("upload"):
+                message = await self.edit_original(interaction, reply)
+            if reply.on_sent is not None:
+                reply.on_sent(message)
+        except Exception as e:
+            record_error("interaction_followup", e)
+            print(f"✗ Не удалось отправить ответ на /{command}: {e}")
+
+    async def edit_original(self, interaction: dict, reply: InteractionReply) -> dict:
+        """
+        Заменяет отложенный ответ ("бот думает...") результатом команды.
+
+        Returns:
+            JSON отправленного сообщения (с адресами вложений в attachments)
+        """
+        url = (f"{DISCORD_API}/webhooks/{interaction['application_id']}"
+               f"/{interaction['token']}/messages/@original")
+        payload = {"content": reply.content, "embeds": reply.embeds}
+        form = aiohttp.FormData()
+        if reply.file is not None:
+            filename, data = reply.file
+            payload["attachments"] = [{"id": 0, "filename": filename}]
+            form.add_field("files[0]", data, filename=filename)
+        form.add_field("payload_json", json.dumps(payload), content_type="application/json")
+        # Токен взаимодействия сам авторизует webhook, токен бота не нужен
+        async with self._session.patch(url, data=form) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def start(self):
+        if not self.port or self._runner is not None:
+            return
+        if VerifyKey is None:
+            raise RuntimeError("Для INTERACTIONS_PORT установите пакет PyNaCl: pip install pynacl")
+        if not self.public_key:
+            raise RuntimeError("Для INTERACTIONS_PORT нужна переменная DISCORD_PUBLIC_KEY")
+        self._verify_key = VerifyKey(bytes.fromhex(self.public_key))
+        self._session = aiohttp.ClientSession()
+        app = web.Application()
+        app.router.add_post("/interactions", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"✓ Slash-команды принимаются на http://{self.host}:{self.port}/interactions")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        # Даем уже принятым командам дослать ответ
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Очередь заданий рендера между ботом и воркерами (render_worker.py).
+
+Бот только ставит задания и ждет результат (байты изображения или JSON билдов),
+а рендерят воркеры. Бэкенд выбирается переменной RENDER_BACKEND:
+
+    inprocess - воркер работает внутри процесса бота (как раньше)
+    socket    - воркеры подключаются к боту по TCP или unix-сокету (RENDER_QUEUE_ADDR)
+    redis     - общая очередь в Redis (REDIS_URL), воркеры могут жить на других хостах
+
+Сторона бота: submit(kind, hero). Сторона воркера: next_job() и complete(...).
+Для пакетного задания heroes вместо имени передается список героев, а результат
+упакован pack_parts.
+"""
+
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import struct
+import uuid
+
+# Бэкенд очереди: inprocess, socket или redis
+RENDER_BACKEND = os.getenv("RENDER_BACKEND", "inprocess").lower()
+# Адрес сокета для бэкенда socket: host:port или unix:/путь
+RENDER_QUEUE_ADDR = os.getenv("RENDER_QUEUE_ADDR", "127.0.0.1:8765")
+# Общий секрет воркеров для бэкенда socket (обязателен, если адрес не локальный)
+RENDER_QUEUE_TOKEN = os.getenv("RENDER_QUEUE_TOKEN", "")
+# Максимальный размер результата задания в мегабайтах (больше - воркер отключается)
+RENDER_MAX_RESULT_MB = int(os.getenv("RENDER_MAX_RESULT_MB", "32"))
+# Адрес Redis для бэкенда redis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Сколько секунд ждать результат задания
+RENDER_JOB_TIMEOUT = float(os.getenv("RENDER_JOB_TIMEOUT", "90"))
+
+# Максимальный размер JSON-заголовка кадра в байтах
+MAX_HEADER_BYTES = 64 * 1024
+# Сколько секунд воркер может подключаться, не представившись
+HANDSHAKE_TIMEOUT = 10
+
+REDIS_JOBS_KEY = "dpt:render:jobs"
+REDIS_RESULT_PREFIX = "dpt:render:result:"
+# Сколько секунд результат хранится в Redis, если его никто не забрал
+REDIS_RESULT_TTL = 120
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+class RenderJobError(Exception):
+    """Воркер не смог выполнить задание"""
+
+
+class ProtocolError(ConnectionError):
+    """Собеседник нарушил протокол очереди (слишком большой кадр, неверный токен)"""
+
+
+def _new_job(kind: str, hero: str) -> dict:
+    return {"id": uuid.uuid4().hex, "kind": kind, "hero": hero}
+
+
+def _result_header(job: dict, data: bytes | None, error: str | None) -> dict:
+    return {"id": job["id"], "ok": error is None, "error": error, "size": len(data or b"")}
+
+
+def _unpack_result(header: dict, payload: bytes) -> bytes | None:
+    if not header["ok"]:
+        raise RenderJobError(header["error"])
+    return payload or None
+
+
+def pack_parts(parts: list[bytes | None]) -> bytes:
+    """Упаковывает несколько результатов (пакетный рендер) в одни байты"""
+    chunks = [struct.pack(">I", len(parts))]
+    for part in parts:
+        chunks.append(struct.pack(">I", len(part or b"")))
+        chunks.append(part or b"")
+    return b"".join(chunks)
+
+
+def unpack_parts(data: bytes | None) -> list[bytes | None]:
+    """Обратное к pack_parts (пустая часть - None)"""
+    if not data:
+        return []
+    (count,) = struct.unpack_from(">I", data)
+    offset = 4
+    parts = []
+    for _ in range(count):
+        (size,) = struct.unpack_from(">I", data, offset)
+        offset += 4
+        parts.append(data[offset:offset + size] or None)
+        offset += size
+    return parts
+
+
+async def _send_frame(writer: asyncio.StreamWriter, header: dict, payload: bytes = b""):
+    """Кадр: длина JSON-заголовка (4 байта), заголовок, затем payload длиной header['size']"""
+    raw = json.dumps(header).encode("utf-8")
+    writer.write(struct.pack(">I", len(raw)) + raw + payload)
+    await writer.drain()
+
+
+async def _read_frame(reader: asyncio.StreamReader,
+                      max_payload: int = RENDER_MAX_RESULT_MB * 1024 * 1024) -> tuple[dict, bytes]:
+    (length,) = struct.unpack(">I", await reader.readexactly(4))
+    # Размерам из кадра не доверяем: иначе один собеседник заставит выделить гигабайты
+    if length > MAX_HEADER_BYTES:
+        raise ProtocolError(f"заголовок кадра слишком большой: {length} байт")
+    try:
+        header = json.loads(await reader.readexactly(length))
+        size = int(header.get("size", 0))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ProtocolError(f"некорректный заголовок кадра: {e}")
+    if not 0 <= size <= max_payload:
+        raise ProtocolError(f"недопустимый размер данных кадра: {size} байт")
+    payload = await reader.readexactly(size)
+    return header, payload
+
+
+def _is_local_address(address: str) -> bool:
+    """unix-сокет или loopback - туда не подключиться с других хостов"""
+    if address.startswith("unix:"):
+        return True
+    host = address.rsplit(":", 1)[0].strip("[]")
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def _open_connection(address: str):
+    if address.startswith("unix:"):
+        return await asyncio.open_unix_connection(address[len("unix:"):])
+    host, port = address.rsplit(":", 1)
+    return await asyncio.open_connection(host, int(port))
+
+
+class InProcessQueue:
+    """Очередь внутри процесса бота: воркер забирает задания напрямую"""
+
+    def __init__(self, timeout: float = RENDER_JOB_TIMEOUT):
+        self.timeout = timeout
+        self._jobs: asyncio.Queue = asyncio.Queue()
+        self._pending: dict[str, asyncio.Future] = {}
+
+    async def start(self):
+        pass
+
+    async def submit(self, kind: str, hero: str) -> bytes | None:
+        """Ставит задание и ждет результат (None - рендер не удался)"""
+        job = _new_job(kind, hero)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[job["id"]] = future
+        await self._jobs.put(job)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(job["id"], None)
+
+    async def next_job(self) -> dict:
+        while True:
+            job = await self._jobs.get()
+            # Задание, которое уже никто не ждет, не рендерим
+            if job["id"] in self._pending:
+                return job
+
+    async def complete(self, job: dict, data: bytes | None = None, error: str | None = None):
+        future = self._pending.get(job["id"])
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(RenderJobError(error))
+        else:
+            future.set_result(data)
+
+    async def close(self):
+        pass
+
+
+class SocketJobQueue(InProcessQueue):
+    """
+    Сторона бота для бэкенда socket: слушает RENDER_QUEUE_ADDR.
+    Каждое подключение воркера - одна свободная страница: бот отдает ему
+    задание и ждет результат. Если воркер отключился, задание возвращается в очередь.
+    """
+
+    def __init__(self, address: str = RENDER_QUEUE_ADDR, timeout: float = RENDER_JOB_TIMEOUT,
+                 token: str = RENDER_QUEUE_TOKEN):
+        super().__init__(timeout)
+        self.address = address
+        self.token = token
+        self._server: asyncio.AbstractServer | None = None
+        self._handlers: set[asyncio.Task] = set()
+
+    async def start(self):
+        if self._server is not None:
+            return
+        if not self.token and not _is_local_address(self.address):
+            # Любой, кто достучится до порта, мог бы отправлять картинки в Discord от имени бота
+            raise RuntimeError(f"Для RENDER_QUEUE_ADDR={self.address} задайте RENDER_QUEUE_TOKEN")
+        if self.address.startswith("unix:"):
+            path = self.address[len("unix:"):]
+            if os.path.exists(path):
+                os.unlink(path)
+            self._server = await asyncio.start_unix_server(self._handle_worker, path)
+        else:
+            host, port = self.address.rsplit(":", 1)
+            self._server = await asyncio.start_server(self._handle_worker, host, int(port))
+        print(f"✓ Очередь рендеров ждет воркеров на {self.address}")
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername") or "unix"
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        job = None
+        try:
+            # Воркер сначала представляется токеном, и только потом получает задания
+            header, _ = await asyncio.wait_for(_read_frame(reader, max_payload=0), HANDSHAKE_TIMEOUT)
+            if not hmac.compare_digest(str(header.get("token", "")).encode(), self.token.encode()):
+                raise ProtocolError("неверный RENDER_QUEUE_TOKEN")
+            print(f"✓ Подключился воркер рендера: {peer}")
+            while True:
+                job = await self.next_job()
+                await _send_frame(writer, job)
+                # Хост воркера мог пропасть без FIN - не ждем дольше, чем ждет сам бот
+                header, payload = await asyncio.wait_for(_read_frame(reader), self.timeout)
+                if header.get("id") != job["id"] or "ok" not in header:
+                    raise ProtocolError(f"некорректный результат задания: {header!r:.200}")
+                if header["ok"]:
+                    await self.complete(job, payload or None)
+                else:
+                    await self.complete(job, error=str(header.get("error")))
+                job = None
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            print(f"⚠ Воркер рендера {peer} отключился: {e!r}")
+        except asyncio.CancelledError:
+            # Очередь закрывается (close) - выходим без ошибки
+            pass
+        finally:
+            if job is not None and job["id"] in self._pending:
+                # Отдаем незавершенное задание другому воркеру
+                self._jobs.put_nowait(job)
+            self._handlers.discard(task)
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # Обработчики ждут заданий бесконечно - отменяем их, иначе сервер не закроется
+            for task in list(self._handlers):
+                task.cancel()
+            await self._server.wait_closed()
+            self._server = None
+
+
+class SocketWorkerConnection:
+    """Сторона воркера для бэкенда socket: одно подключение - одно задание за раз"""
+
+    def __init__(self, address: str = RENDER_QUEUE_ADDR, token: str = RENDER_QUEUE_TOKEN):
+        self.address = address
+        self.token = token
+        self._reader = None
+        self._writer = None
+
+    async def connect(self):
+        self._reader, self._writer = await _open_connection(self.address)
+        await _send_frame(self._writer, {"token": self.token})
+
+    async def next_job(self) -> dict:
+        header, _ = await _read_frame(self._reader)
+        return header
+
+    async def complete(self, job: dict, data: bytes | None = None, error: str | None = None):
+        await _send_frame(self._writer, _result_header(job, data, error), data or b"")
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class RedisJobQueue:
+    """
+    Бэкенд redis: задания в списке REDIS_JOBS_KEY, результат каждого задания -
+    в отдельном списке, который бот ждет через BLPOP. Нужен пакет redis.
+    """
+
+    def __init__(self, url: str = REDIS_URL, timeout: float = RENDER_JOB_TIMEOUT):
+        if aioredis is None:
+            raise RuntimeError("Для RENDER_BACKEND=redis установите пакет redis: pip install redis")
+        self.timeout = timeout
+        self._redis = aioredis.from_url(url)
+
+    async def start(self):
+        await self._redis.ping()
+        print("✓ Очередь рендеров подключена к Redis")
+
+    async def submit(self, kind: str, hero: str) -> bytes | None:
+        job = _new_job(kind, hero)
+        await self._redis.rpush(REDIS_JOBS_KEY, json.dumps(job))
+        result = await self._redis.blpop(REDIS_RESULT_PREFIX + job["id"], timeout=self.timeout)
+        if result is None:
+            raise asyncio.TimeoutError()
+        raw = result[1]
+        length = struct.unpack(">I", raw[:4])[0]
+        header = json.loads(raw[4:4 + length])
+        return _unpack_result(header, raw[4 + length:])
+
+    async def next_job(self) -> dict:
+        _, raw = await self._redis.blpop(REDIS_JOBS_KEY, timeout=0)
+        return json.loads(raw)
+
+    async def complete(self, job: dict, data: bytes | None = None, error: str | None = None):
+        raw = json.dumps(_result_header(job, data, error)).encode("utf-8")
+        key = REDIS_RESULT_PREFIX + job["id"]
+        async with self._redis.pipeline() as pipe:
+            pipe.rpush(key, struct.pack(">I", len(raw)) + raw + (data or b""))
+            pipe.expire(key, REDIS_RESULT_TTL)
+            await pipe.execute()
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_job_queue(backend: str = RENDER_BACKEND):
+    """Очередь заданий для бота"""
+    if backend == "socket":
+        return SocketJobQueue()
+    if backend == "redis":
+        return RedisJobQueue()
+    return InProcessQueue()
+
+
+async def connect_worker(backend: str = RENDER_BACKEND):
+    """Подключение воркера к очереди (для socket - отдельное на каждую страницу)"""
+    if backend == "socket":
+        connection = SocketWorkerConnection()
+        await connection.connect()
+        return connection
+    if backend == "redis":
+        return RedisJobQueue()
+    raise ValueError(f"Бэкенд {backend} не поддерживает отдельные воркеры")
@@ -4,93 +4,519 @@ Discord бот для создания скриншотов героев с dota
 """
 
 import os
+import io
+import time
 import asyncio
 import discord
 from discord.ext import commands
-from pathlib import Path
 import sys
 from dotenv import load_dotenv
 import aiohttp
 
+# Момент запуска процесса - от него считается время до готовности бота
+STARTED_AT = time.perf_counter()
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
 # Импортируем функцию из screenshot_hero.py
-from screenshot_hero import screenshot_hero, ensure_browser_installed
-
-# Настройки бота
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+from screenshot_hero import ensure_browser_installed_async, invalidate_browser_marker, hero_url
+from browser_pool import BrowserPool
+from render_cache import RenderCache
+from attachment_cache import AttachmentCache
+from prerender import PrerenderScheduler, DEFAULT_HEROES as DEFAULT_PRERENDER_HEROES
+from hero_index import HeroIndex
+from image_encoding import image_extension, compose_grid
+from builds_parser import HeroBuilds
+from match_client import MatchClient
+from render_queue import RenderScheduler, QueueFullError
+from metrics import MetricsServer, span, record_error, stats_summary
+from job_queue import RENDER_BACKEND, create_job_queue, unpack_parts
+from render_worker import start_workers
+from interactions_server import InteractionsServer, InteractionReply
 
 # Папка для скриншотов
 SCREENSHOTS_DIR = "screenshots"
 
 # URL API для получения данных о матче
-MATCH_API_URL = "https://dotaspectator-production.up.railway.app/players"
+MATCH_API_URL = os.getenv("MATCH_API_URL", "https://dotaspectator-production.up.railway.app/players")
+
+# Клиент API матча: общая сессия и короткий кэш (MATCH_CACHE_TTL)
+match_client = MatchClient(MATCH_API_URL)
+
+# Пул браузера живет все время работы бота (размер задается BROWSER_POOL_SIZE)
+browser_pool = BrowserPool()
+# Очередь рендеров: ограничивает число одновременных рендеров и длину очереди,
+# обходит серверы по кругу (настройки RENDER_*)
+render_scheduler = RenderScheduler()
+# Очередь заданий для воркеров рендера (RENDER_BACKEND): бот только ставит задания
+# и ждет результат. При inprocess воркеры работают в этом же процессе с browser_pool
+job_queue = create_job_queue()
+render_workers: list[asyncio.Task] = []
+# Эндпоинт /metrics для Prometheus (включается переменной METRICS_PORT)
+metrics_server = MetricsServer()
+
+# Прогрев рендера (проверка и запуск браузера) идет в фоне после старта бота.
+# Событие устанавливается, когда прогрев завершен - успешно или нет
+renderer_ready = asyncio.Event()
+renderer_error: str | None = None
+# Сколько секунд команда ждет окончания прогрева
+RENDER_READY_TIMEOUT = float(os.getenv("RENDER_READY_TIMEOUT", "60"))
+
+
+class RendererUnavailable(Exception):
+    """Браузер не прогрелся или не запустился"""
+
+# Индекс героев: названия, алиасы и русские имена из data/heroes.json
+hero_index = HeroIndex.load()
+
+# Формат отправляемых изображений (IMAGE_FORMAT, IMAGE_QUALITY, IMAGE_MAX_WIDTH)
+IMAGE_EXTENSION = image_extension()
+
+# Кэш скриншотов (TTL и лимиты задаются SCREENSHOT_CACHE_*)
+screenshot_cache = RenderCache(SCREENSHOTS_DIR, suffix=f".{IMAGE_EXTENSION}")
+# Уже загруженные в Discord скриншоты: одинаковое изображение не загружается повторно
+attachment_cache = AttachmentCache(os.path.join(SCREENSHOTS_DIR, "attachments.json"))
+
+
+def make_hero_render(hero_name: str, key: str = "prerender", user=None, on_position=None):
+    """
+    Возвращает функцию рендера скриншота героя для кэша.
+    Рендер проходит через очередь: key - сервер, user - автор запроса.
+    """
+    async def job():
+        return await job_queue.submit("hero", hero_name)
+
+    async def render():
+        return await render_scheduler.submit(key, job, user=user, on_position=on_position)
+    return render
+
+
+async def hero_image(hero_name: str, key: str, user=None, on_position=None,
+                     status_message=None) -> bytes | None:
+    """Скриншот героя для ответа пользователю: из кэша или через очередь рендеров"""
+    # Пока браузер прогревается, можно отдать только готовый скриншот из кэша
+    image = None if renderer_ready.is_set() else await screenshot_cache.get(hero_name)
+    if image is None:
+        await wait_renderer(status_message)
+        # Свежий скриншот берется из кэша, иначе запускается (общий) рендер
+        render = make_hero_render(hero_name, key, user, on_position)
+        image = await screenshot_cache.get_or_render(hero_name, render)
+    return image
+
+
+# Сколько героев можно запросить одной командой !heroes (Discord принимает до 10 файлов)
+HEROES_BATCH_MAX = min(10, int(os.getenv("HEROES_BATCH_MAX", "5")))
+
+
+async def render_heroes(hero_names: list[str], key: str, user=None, on_position=None,
+                        status_message=None) -> dict:
+    """
+    Скриншоты нескольких героев: свежие берутся из кэша, остальные рендерятся
+    одним пакетным заданием (один контекст браузера, страницы параллельно).
+
+    Returns:
+        Словарь герой -> изображение или None
+    """
+    images = {hero_name: await screenshot_cache.get(hero_name) for hero_name in hero_names}
+    missing = [hero_name for hero_name, image in images.items() if image is None]
+    if missing:
+        await wait_renderer(status_message)
+        async def job():
+            return unpack_parts(await job_queue.submit("heroes", missing))
+
+        rendered = await render_scheduler.submit(key, job, user=user, on_position=on_position)
+        for hero_name, image in zip(missing, rendered):
+            images[hero_name] = image
+            if image is not None:
+                await screenshot_cache.put(hero_name, image)
+    return images
+
+
+# Кэш билдов в виде данных (JSON) - те же настройки TTL, что и у скриншотов
+builds_cache = RenderCache(os.path.join(SCREENSHOTS_DIR, "builds"), suffix=".json")
+
+
+def make_builds_render(hero_name: str, key: str = "prerender", user=None):
+    """Возвращает функцию извлечения билдов героя (JSON) для кэша"""
+    async def job():
+        return await job_queue.submit("builds", hero_name)
+
+    async def render():
+        return await render_scheduler.submit(key, job, user=user)
+    return render
+
+
+def prerender_heroes() -> list[str]:
+    """Герои из PRERENDER_HEROES в виде тех же ключей кэша, что и у !hero"""
+    if os.getenv("PRERENDER_HEROES") == "all":
+        return [hero.slug for hero in hero_index]
+    slugs = []
+    for name in DEFAULT_PRERENDER_HEROES:
+        hero = hero_index.resolve(name)
+        if hero is None:
+            print(f"⚠ PRERENDER_HEROES: герой '{name}' не найден, пропускаю")
+        elif hero.slug not in slugs:
+            slugs.append(hero.slug)
+    return slugs
+
+
+# Фоновое обновление скриншотов популярных героев (настройки PRERENDER_*).
+# Пока очередь рендеров занята пользовательскими запросами, фоновый рендер ждет.
+# PRERENDER_HEROES=all - поддерживать свежими скриншоты всех героев.
+prerender_scheduler = PrerenderScheduler(
+    screenshot_cache,
+    make_hero_render,
+    is_busy=lambda: render_scheduler.busy,
+    heroes=prerender_heroes()
+)
+
+
+async def warm_up_renderer():
+    """Проверяет и запускает браузер в фоне, не задерживая подключение к Discord"""
+    global renderer_error
+    try:
+        if RENDER_BACKEND == "inprocess":
+            # Вторая попытка - после сброса отметки, уже с настоящей проверкой/установкой
+            for attempt in range(2):
+                # Проверка выполняется в отдельном потоке и один раз на процесс
+                if not await ensure_browser_installed_async():
+                    renderer_error = "браузер Chromium не установлен"
+                    return
+                try:
+                    # Запускаем браузер заранее, чтобы первый !hero не ждал холодного старта
+                    await browser_pool.start()
+                    break
+                except Exception as e:
+                    # Отметка могла устареть (браузер удалили, сменилась версия) - сбрасываем ее
+                    invalidate_browser_marker()
+                    if attempt:
+                        renderer_error = f"не удалось запустить Chromium: {e}"
+                        return
+                    print(f"⚠ Chromium не запустился ({e}), проверяю установку заново...")
+            render_workers.extend(start_workers(job_queue, browser_pool, browser_pool.size))
+        prerender_scheduler.start()
+        print(f"✓ Рендер готов через {(time.perf_counter() - STARTED_AT) * 1000:.0f} мс после запуска")
+    finally:
+        if renderer_error:
+            print(f"✗ Рендер недоступен: {renderer_error}")
+        renderer_ready.set()
+
+
+async def wait_renderer(status_message=None):
+    """
+    Ждет окончания прогрева рендера (сразу возвращается, если он уже готов).
+
+    Raises:
+        RendererUnavailable: Прогрев не успел завершиться или браузер не запустился
+    """
+    if not renderer_ready.is_set():
+        if status_message is not None:
+            await status_message.edit(content="⏳ Браузер запускается, запрос выполнится через несколько секунд...")
+        try:
+            await asyncio.wait_for(renderer_ready.wait(), RENDER_READY_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise RendererUnavailable("браузер еще запускается")
+    if renderer_error:
+        raise RendererUnavailable(renderer_error)
+
+
+async def start_services() -> asyncio.Task:
+    """Запускает очередь, метрики, эндпоинт slash-команд и прогрев рендера в фоне"""
+    await job_queue.start()
+    await metrics_server.start()
+    await interactions_server.start()
+    return asyncio.create_task(warm_up_renderer())
+
+
+async def stop_services(warm_up_task: asyncio.Task | None):
+    """Останавливает фоновые задачи, закрывает браузер и HTTP-сессии"""
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    # Сначала перестаем принимать slash-команды и дожидаемся уже принятых
+    await interactions_server.close()
+    await prerender_scheduler.stop()
+    for worker in render_workers:
+        worker.cancel()
+    await job_queue.close()
+    await browser_pool.close()
+    await match_client.close()
+    await metrics_server.close()
+
+
+class HeroBot(commands.Bot):
+    async def setup_hook(self):
+        # Выполняется один раз на процесс, в отличие от on_ready,
+        # который срабатывает при каждом переподключении к Discord
+        self.warm_up_task = await start_services()
+
+    async def close(self):
+        await stop_services(getattr(self, "warm_up_task", None))
+        await super().close()
+
+
+# Настройки бота
+intents = discord.Intents.default()
+intents.message_content = True
+bot = HeroBot(command_prefix='!', intents=intents)
 
 
 @bot.event
 async def on_ready():
+    # Срабатывает и при переподключениях - запуск браузера и фоновых задач в setup_hook
     print(f'{bot.user} подключен к Discord!')
-    print(f'Бот готов к работе!')
-    # Проверяем наличие браузера при запуске
-    ensure_browser_installed()
+    print(f'Бот готов к работе за {(time.perf_counter() - STARTED_AT) * 1000:.0f} мс!')
+
+
+def hero_not_found_message(hero_name: str) -> str:
+    """Ответ на неизвестного героя с подсказками похожих названий"""
+    message = f"❌ Герой **{hero_name.strip()}** не найден."
+    suggestions = hero_index.suggest(hero_name)
+    if suggestions:
+        names = ", ".join(f"`{s.name}`" for s in suggestions)
+        message += f"\nВозможно, вы имели в виду: {names}"
+    return message
+
+
+async def resolve_hero(ctx, hero_name: str):
+    """Определяет героя локально, до запуска браузера. Если герой не найден, отвечает подсказкой"""
+    hero = hero_index.resolve(hero_name)
+    if hero is None:
+        await ctx.send(hero_not_found_message(hero_name))
+    return hero
+
+
+def queue_key(ctx) -> str:
+    """Ключ справедливости очереди рендеров: сервер, а в личных сообщениях - пользователь"""
+    return f"guild:{ctx.guild.id}" if ctx.guild else f"user:{ctx.author.id}"
 
 
 @bot.command(name='hero', aliases=['h', 'герой'])
-async def hero_screenshot(ctx, hero_name: str = None):
+async def hero_screenshot(ctx, *, hero_name: str = None):
     """
     Команда для создания скриншота героя.
     Использование: !hero <название_героя>
-    Пример: !hero mars
+    Пример: !hero mars, !hero am, !hero queen of pain, !hero антимаг
     """
     if hero_name is None:
         await ctx.send("❌ Пожалуйста, укажите название героя.\n"
                       "Пример: `!hero mars` или `!hero pudge`")
         return
     
-    hero_name = hero_name.lower().strip()
+    hero = await resolve_hero(ctx, hero_name)
+    if hero is None:
+        return
+    
+    hero_name = hero.slug
     
     # Показываем что бот обрабатывает запрос
-    await ctx.send(f"🔄 Обрабатываю запрос для героя **{hero_name}**...")
+    processing_text = f"🔄 Обрабатываю запрос для героя **{hero.name}**..."
+    status_message = await ctx.send(processing_text)
+    
+    async def show_position(position: int):
+        # Обновляем сообщение о статусе, пока запрос ждет в очереди
+        if position:
+            await status_message.edit(content=f"⏳ Запрос для **{hero.name}** в очереди: {position}")
+        else:
+            await status_message.edit(content=processing_text)
+    
+    # Учитываем популярность героя для фонового обновления
+    prerender_scheduler.record(hero_name)
     
     try:
-        # Запускаем скрипт создания скриншота в отдельном потоке
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(
-            None, 
-            screenshot_hero, 
-            hero_name, 
-            SCREENSHOTS_DIR, 
-            200  # wait_time
-        )
+        image = await hero_image(hero_name, queue_key(ctx), ctx.author.id, show_position, status_message)
         
-        # Путь к скриншоту
-        screenshot_path = Path(SCREENSHOTS_DIR) / f"{hero_name}.png"
-        
-        if screenshot_path.exists():
-            # Отправляем скриншот в канал
-            file = discord.File(str(screenshot_path), filename=f"{hero_name}_builds.png")
-            await ctx.send(
-                f"✅ Скриншот билда для **{hero_name}** готов!",
-                file=file
-            )
+        if image is not None:
+            cdn_url = attachment_cache.lookup(hero_name, image)
+            if cdn_url is not None:
+                # Такое же изображение уже загружено - ссылаемся на него в CDN Discord
+                embed = discord.Embed(color=0x5865F2)
+                embed.set_image(url=cdn_url)
+                with span("upload"):
+                    await ctx.send(f"✅ Скриншот билда для **{hero.name}** готов!", embed=embed)
+            else:
+                # Отправляем скриншот в канал прямо из памяти
+                filename = f"{screenshot_cache.path_for(hero_name).stem}_builds.{IMAGE_EXTENSION}"
+                file = discord.File(io.BytesIO(image), filename=filename)
+                with span("upload"):
+                    message = await ctx.send(
+                        f"✅ Скриншот билда для **{hero.name}** готов!",
+                        file=file
+                    )
+                if message.attachments:
+                    attachment_cache.remember(hero_name, image, message.attachments[0].url)
         else:
-            await ctx.send(f"❌ Не удалось создать скриншот для героя **{hero_name}**")
+            await ctx.send(f"❌ Не удалось создать скриншот для героя **{hero.name}**")
             
+    except QueueFullError as e:
+        # Сразу отказываем, а не копим запросы, которые не успеют выполниться
+        await status_message.edit(content=f"⚠️ Бот сейчас перегружен ({e}). Попробуйте через минуту.")
+    except RendererUnavailable as e:
+        await status_message.edit(content=f"⚠️ Рендер сейчас недоступен ({e}). Попробуйте позже.")
     except Exception as e:
+        record_error("hero_command", e)
         error_msg = str(e)
         print(f"Ошибка при создании скриншота: {error_msg}")
         import traceback
         traceback.print_exc()
         await ctx.send(
-            f"❌ Произошла ошибка при создании скриншота для **{hero_name}**:\n"
+            f"❌ Произошла ошибка при создании скриншота для **{hero.name}**:\n"
             f"`{error_msg[:200]}`\n\n"
             f"Попробуйте еще раз через несколько секунд."
         )
 
 
+@bot.command(name='heroes', aliases=['hs', 'герои'])
+async def heroes_command(ctx, *, hero_names: str = None):
+    """
+    Команда для скриншотов нескольких героев одним сообщением.
+    Использование: !heroes <герой> <герой> ... [--grid]
+    Пример: !heroes mars pudge invoker, !heroes queen of pain, anti-mage --grid
+    """
+    if hero_names is None:
+        await ctx.send("❌ Пожалуйста, укажите героев.\n"
+                      "Пример: `!heroes mars pudge invoker`")
+        return
+    
+    # --grid - склеить скриншоты в одно изображение
+    grid = "--grid" in hero_names.split()
+    hero_names = hero_names.replace("--grid", " ")
+    # Названия из нескольких слов можно разделять запятыми
+    names = hero_names.split(",") if "," in hero_names else hero_names.split()
+    
+    heroes = []
+    for name in names:
+        if not name.strip():
+            continue
+        hero = await resolve_hero(ctx, name)
+        if hero is not None and hero not in heroes:
+            heroes.append(hero)
+    if not heroes:
+        return
+    if len(heroes) > HEROES_BATCH_MAX:
+        await ctx.send(f"❌ Не больше {HEROES_BATCH_MAX} героев за один раз")
+        return
+    
+    hero_list = ", ".join(hero.name for hero in heroes)
+    processing_text = f"🔄 Обрабатываю запрос для героев: **{hero_list}**..."
+    status_message = await ctx.send(processing_text)
+    
+    async def show_position(position: int):
+        if position:
+            await status_message.edit(content=f"⏳ Запрос для героев в очереди: {position}")
+        else:
+            await status_message.edit(content=processing_text)
+    
+    for hero in heroes:
+        prerender_scheduler.record(hero.slug)
+    
+    try:
+        images = await render_heroes([hero.slug for hero in heroes], queue_key(ctx), ctx.author.id,
+                                     show_position, status_message)
+        ready = [(hero, images[hero.slug]) for hero in heroes if images.get(hero.slug)]
+        failed = [hero.name for hero in heroes if not images.get(hero.slug)]
+        if not ready:
+            await ctx.send(f"❌ Не удалось создать скриншоты для героев **{hero_list}**")
+            return
+        
+        grid_image = None
+        if grid and len(ready) > 1:
+            grid_image = await asyncio.to_thread(compose_grid, [image for _, image in ready])
+        if grid_image is not None:
+            files = [discord.File(io.BytesIO(grid_image), filename=f"heroes_grid.{IMAGE_EXTENSION}")]
+        else:
+            files = [
+                discord.File(io.BytesIO(image), filename=f"{screenshot_cache.path_for(hero.slug).stem}_builds.{IMAGE_EXTENSION}")
+                for hero, image in ready
+            ]
+        
+        message = f"✅ Скриншоты билдов готовы: **{', '.join(hero.name for hero, _ in ready)}**"
+        if failed:
+            message += f"\n❌ Не удалось: {', '.join(failed)}"
+        # Все скриншоты одним сообщением
+        with span("upload"):
+            await ctx.send(message, files=files)
+    
+    except QueueFullError as e:
+        await status_message.edit(content=f"⚠️ Бот сейчас перегружен ({e}). Попробуйте через минуту.")
+    except RendererUnavailable as e:
+        await status_message.edit(content=f"⚠️ Рендер сейчас недоступен ({e}). Попробуйте позже.")
+    except Exception as e:
+        record_error("heroes_command", e)
+        error_msg = str(e)
+        print(f"Ошибка при создании скриншотов: {error_msg}")
+        import traceback
+        traceback.print_exc()
+        await ctx.send(
+            f"❌ Произошла ошибка при создании скриншотов для **{hero_list}**:\n"
+            f"`{error_msg[:200]}`"
+        )
+
+
+def builds_embed(hero, builds: HeroBuilds) -> discord.Embed:
+    """Оформляет билды героя в виде embed-сообщения"""
+    embed = discord.Embed(
+        title=f"🛠 Билды: {hero.name}",
+        url=hero_url(hero.slug),
+        color=0x5865F2
+    )
+    # Discord ограничивает embed 25 полями, показываем самые популярные билды
+    for number, build in enumerate(builds.builds[:5], start=1):
+        stats = []
+        if build.win_rate is not None:
+            stats.append(f"{build.win_rate:.1f}% побед")
+        if build.matches is not None:
+            stats.append(f"{build.matches:,} матчей".replace(",", " "))
+        name = f"Билд #{number}" + (f" — {', '.join(stats)}" if stats else "")
+        lines = []
+        if build.items:
+            lines.append("**Предметы:** " + " → ".join(build.items))
+        if build.skills:
+            lines.append("**Способности:** " + " → ".join(build.skills))
+        embed.add_field(name=name, value="\n".join(lines)[:1024], inline=False)
+    return embed
+
+
+@bot.command(name='builds', aliases=['b', 'билды'])
+async def builds_command(ctx, *, hero_name: str = None):
+    """
+    Команда для получения билдов героя текстом, без скриншота.
+    Использование: !builds <название_героя>
+    Пример: !builds mars
+    """
+    if hero_name is None:
+        await ctx.send("❌ Пожалуйста, укажите название героя.\n"
+                      "Пример: `!builds mars`")
+        return
+    
+    hero = await resolve_hero(ctx, hero_name)
+    if hero is None:
+        return
+    
+    try:
+        data = None if renderer_ready.is_set() else await builds_cache.get(hero.slug)
+        if data is None:
+            await wait_renderer()
+            render = make_builds_render(hero.slug, queue_key(ctx), ctx.author.id)
+            data = await builds_cache.get_or_render(hero.slug, render)
+        if data is None:
+            await ctx.send(f"❌ Не удалось получить билды для **{hero.name}**. "
+                           f"Попробуйте `!hero {hero.slug}`")
+            return
+        await ctx.send(embed=builds_embed(hero, HeroBuilds.from_json(data)))
+    except QueueFullError as e:
+        await ctx.send(f"⚠️ Бот сейчас перегружен ({e}). Попробуйте через минуту.")
+    except RendererUnavailable as e:
+        await ctx.send(f"⚠️ Рендер сейчас недоступен ({e}). Попробуйте позже.")
+    except Exception as e:
+        record_error("builds_command", e)
+        error_msg = str(e)
+        print(f"Ошибка при получении билдов: {error_msg}")
+        import traceback
+        traceback.print_exc()
+        await ctx.send(f"❌ Произошла ошибка при получении билдов для **{hero.name}**:\n`{error_msg[:200]}`")
+
+
 @bot.command(name='match')
 async def match_command(ctx):
     """
@@ -98,87 +524,90 @@ async def match_command(ctx):
     Использование: !match
     """
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(MATCH_API_URL, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    # Проверяем статус ответа
-                    if data.get("status") == "no_match":
-                        await ctx.send("❌ Нет активного матча. Убедитесь, что матч запущен и сервер GSI получает данные.")
-                        return
-                    
-                    if data.get("status") == "error":
-                        error_msg = data.get("message", "Неизвестная ошибка")
-                        await ctx.send(f"❌ Ошибка при получении данных о матче: {error_msg}")
-                        return
-                    
-                    players = data.get("players", [])
-                    
-                    if not players:
-                        await ctx.send("❌ Игроки не найдены в данных матча.")
-                        return
-                    
-                    # Формируем сообщение в формате "Ник - Dotabuff ссылка"
-                    lines = []
-                    for player in players:
-                        name = player.get('name', 'Unknown')
-                        dotabuff_url = player.get('dotabuff_url')
-                        
-                        if dotabuff_url:
-                            lines.append(f"{name} - {dotabuff_url}")
-                        else:
-                            steamid = player.get('steamid', 'N/A')
-                            if steamid != 'N/A':
-                                # Пытаемся создать ссылку вручную
-                                if steamid and str(steamid).isdigit() and len(str(steamid)) == 17:
-                                    dotabuff_url = f"https://www.dotabuff.com/players/{steamid}"
-                                    lines.append(f"{name} - {dotabuff_url}")
-                                else:
-                                    lines.append(f"{name} - (SteamID: {steamid})")
-                            else:
-                                lines.append(f"{name} - (нет SteamID)")
-                    
-                    message_text = "\n".join(lines)
-                    
-                    # Discord имеет лимит на длину сообщения (2000 символов)
-                    # Если сообщение слишком длинное, разбиваем на части
-                    if len(message_text) > 2000:
-                        chunks = []
-                        current_chunk = []
-                        current_length = 0
-                        
-                        for line in lines:
-                            line_length = len(line) + 1  # +1 для переноса строки
-                            
-                            if current_length + line_length > 1900:
-                                chunks.append("\n".join(current_chunk))
-                                current_chunk = [line]
-                                current_length = line_length
-                            else:
-                                current_chunk.append(line)
-                                current_length += line_length
-                        
-                        if current_chunk:
-                            chunks.append("\n".join(current_chunk))
-                        
-                        # Отправляем первое сообщение
-                        await ctx.send(chunks[0])
-                        
-                        # Отправляем остальные части
-                        for chunk in chunks[1:]:
-                            await ctx.send(chunk)
+        # Общая сессия, короткий кэш и объединение одновременных запросов
+        with span("match_upstream"):
+            status, data = await match_client.get_players()
+        
+        if status != 200:
+            await ctx.send(f"❌ Ошибка при обращении к API матча (код {status})")
+            return
+        
+        # Проверяем статус ответа
+        if data.get("status") == "no_match":
+            await ctx.send("❌ Нет активного матча. Убедитесь, что матч запущен и сервер GSI получает данные.")
+            return
+        
+        if data.get("status") == "error":
+            error_msg = data.get("message", "Неизвестная ошибка")
+            await ctx.send(f"❌ Ошибка при получении данных о матче: {error_msg}")
+            return
+        
+        players = data.get("players", [])
+        
+        if not players:
+            await ctx.send("❌ Игроки не найдены в данных матча.")
+            return
+        
+        # Формируем сообщение в формате "Ник - Dotabuff ссылка"
+        lines = []
+        for player in players:
+            name = player.get('name', 'Unknown')
+            dotabuff_url = player.get('dotabuff_url')
+            
+            if dotabuff_url:
+                lines.append(f"{name} - {dotabuff_url}")
+            else:
+                steamid = player.get('steamid', 'N/A')
+                if steamid != 'N/A':
+                    # Пытаемся создать ссылку вручную
+                    if steamid and str(steamid).isdigit() and len(str(steamid)) == 17:
+                        dotabuff_url = f"https://www.dotabuff.com/players/{steamid}"
+                        lines.append(f"{name} - {dotabuff_url}")
                     else:
-                        await ctx.send(message_text)
-                        
+                        lines.append(f"{name} - (SteamID: {steamid})")
+                else:
+                    lines.append(f"{name} - (нет SteamID)")
+        
+        message_text = "\n".join(lines)
+        
+        # Discord имеет лимит на длину сообщения (2000 символов)
+        # Если сообщение слишком длинное, разбиваем на части
+        if len(message_text) > 2000:
+            chunks = []
+            current_chunk = []
+            current_length = 0
+            
+            for line in lines:
+                line_length = len(line) + 1  # +1 для переноса строки
+                
+                if current_length + line_length > 1900:
+                    chunks.append("\n".join(current_chunk))
+                    current_chunk = [line]
+                    current_length = line_length
                 else:
-                    await ctx.send(f"❌ Ошибка при обращении к API матча (код {response.status})")
-                    
+                    current_chunk.append(line)
+                    current_length += line_length
+            
+            if current_chunk:
+                chunks.append("\n".join(current_chunk))
+            
+            # Отправляем первое сообщение
+            await ctx.send(chunks[0])
+            
+            # Отправляем остальные части
+            for chunk in chunks[1:]:
+                await ctx.send(chunk)
+        else:
+            await ctx.send(message_text)
+            
     except aiohttp.ClientError as e:
+        record_error("match_command", e)
         await ctx.send(f"❌ Ошибка при подключении к серверу матча: {str(e)}")
-    except asyncio.TimeoutError:
+    except asyncio.TimeoutError as e:
+        record_error("match_command", e)
         await ctx.send("❌ Превышено время ожидания ответа от сервера матча.")
     except Exception as e:
+        record_error("match_command", e)
         error_msg = str(e)
         print(f"Ошибка при получении данных о матче: {error_msg}")
         import traceback
@@ -186,9 +615,25 @@ async def match_command(ctx):
         await ctx.send(f"❌ Произошла ошибка при получении данных о матче:\n`{error_msg[:200]}`")
 
 
-@bot.command(name='help_hero')
-async def help_command(ctx):
-    """Показывает справку по использованию бота"""
+@bot.command(name='stats')
+@commands.check_any(commands.is_owner(), commands.has_permissions(administrator=True))
+async def stats_command(ctx):
+    """
+    Команда для администраторов: длительность этапов, кэш, ошибки.
+    Использование: !stats
+    """
+    lines = stats_summary()
+    lines.append(f"Очередь рендеров: выполняется {render_scheduler.running}, ждет {render_scheduler.queued}")
+    embed = discord.Embed(
+        title="📊 Статистика бота",
+        description="\n".join(lines)[:4000],
+        color=0x5865F2
+    )
+    await ctx.send(embed=embed)
+
+
+def help_embed() -> discord.Embed:
+    """Справка по командам (для !help_hero и /help_hero)"""
     embed = discord.Embed(
         title="🤖 Dota 2 Hero Screenshot Bot",
         description="Бот для получения скриншотов билдов героев с dota2protracker.com",
@@ -197,16 +642,82 @@ async def help_command(ctx):
     embed.add_field(
         name="Команды",
         value="`!hero <название>` - Получить скриншот билда героя\n"
-              "Примеры: `!hero mars`, `!hero pudge`, `!hero invoker`\n\n"
+              "Примеры: `!hero mars`, `!hero pudge`, `!hero am`, `!hero квопа`\n\n"
+              "`!heroes <герой> <герой> ...` - Скриншоты нескольких героев одним сообщением "
+              "(`--grid` - одной картинкой)\n\n"
+              "`!builds <название>` - Билды героя текстом (предметы, способности, винрейт)\n\n"
               "`!match` - Получить список игроков текущего матча Dota 2",
         inline=False
     )
     embed.add_field(
         name="Алиасы",
-        value="`!h <название>`, `!герой <название>`",
+        value="`!h <название>`, `!герой <название>`\n"
+              "`!hs ...`, `!герои ...`\n"
+              "`!b <название>`, `!билды <название>`",
         inline=False
     )
-    await ctx.send(embed=embed)
+    return embed
+
+
+@bot.command(name='help_hero')
+async def help_command(ctx):
+    """Показывает справку по использованию бота"""
+    await ctx.send(embed=help_embed())
+
+
+async def hero_interaction(interaction: dict) -> InteractionReply:
+    """
+    Slash-команда /hero <название> через HTTP-эндпоинт.
+    Использует тот же кэш, очередь рендеров и браузер, что и !hero.
+    """
+    options = interaction["data"].get("options") or []
+    hero_name = str(options[0]["value"]) if options else ""
+    hero = hero_index.resolve(hero_name)
+    if hero is None:
+        return InteractionReply(hero_not_found_message(hero_name))
+
+    # В личных сообщениях автор приходит в user, на сервере - в member.user
+    user = interaction.get("user") or interaction.get("member", {}).get("user", {})
+    key = f"guild:{interaction['guild_id']}" if interaction.get("guild_id") else f"user:{user.get('id')}"
+    prerender_scheduler.record(hero.slug)
+    try:
+        image = await hero_image(hero.slug, key, user.get("id"))
+    except QueueFullError as e:
+        return InteractionReply(f"⚠️ Бот сейчас перегружен ({e}). Попробуйте через минуту.")
+    except RendererUnavailable as e:
+        return InteractionReply(f"⚠️ Рендер сейчас недоступен ({e}). Попробуйте позже.")
+    if image is None:
+        return InteractionReply(f"❌ Не удалось создать скриншот для героя **{hero.name}**")
+
+    content = f"✅ Скриншот билда для **{hero.name}** готов!"
+    cdn_url = attachment_cache.lookup(hero.slug, image)
+    if cdn_url is not None:
+        # Такое же изображение уже загружено - ссылаемся на него в CDN Discord
+        return InteractionReply(content, embeds=[{"color": 0x5865F2, "image": {"url": cdn_url}}])
+    filename = f"{screenshot_cache.path_for(hero.slug).stem}_builds.{IMAGE_EXTENSION}"
+
+    def remember(message: dict):
+        # Следующий /hero или !hero с тем же изображением сошлется на это вложение
+        if message.get("attachments"):
+            attachment_cache.remember(hero.slug, image, message["attachments"][0]["url"])
+    return InteractionReply(content, file=(filename, image), on_sent=remember)
+
+
+async def help_interaction(interaction: dict) -> InteractionReply:
+    return InteractionReply(embeds=[help_embed().to_dict()])
+
+
+# HTTP-эндпоинт slash-команд (INTERACTIONS_PORT, DISCORD_PUBLIC_KEY)
+interactions_server = InteractionsServer({"hero": hero_interaction, "help_hero": help_interaction})
+
+
+async def serve_interactions():
+    """Режим без gateway: только slash-команды через HTTP-эндпоинт"""
+    warm_up_task = await start_services()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop_services(warm_up_task)
 
 
 @bot.event
@@ -217,12 +728,25 @@ async def on_command_error(ctx, error):
                       "Пример: `!hero mars`")
     elif isinstance(error, commands.CommandNotFound):
         pass  # Игнорируем неизвестные команды
+    elif isinstance(error, commands.CheckFailure):
+        await ctx.send("❌ Эта команда доступна только администраторам")
     else:
         await ctx.send(f"❌ Произошла ошибка: {str(error)}")
 
 
 def main():
     """Запуск бота"""
+    if os.getenv("INTERACTIONS_ONLY") == "1":
+        # Реплики за балансировщиком: подключение к gateway и токен бота не нужны
+        if not interactions_server.port:
+            print("❌ ОШИБКА: для INTERACTIONS_ONLY=1 задайте INTERACTIONS_PORT")
+            sys.exit(1)
+        try:
+            asyncio.run(serve_interactions())
+        except KeyboardInterrupt:
+            pass
+        return
+    
     # Получаем токен из переменной окружения
     token = os.getenv('DISCORD_BOT_TOKEN')
     
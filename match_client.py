@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+HTTP-клиент API матча для команды !match.
+
+Одна сессия aiohttp живет все время работы бота (соединения переиспользуются,
+DNS кэшируется), ответ кэшируется на несколько секунд, а одновременные
+запросы объединяются в один запрос к серверу. Для повторной проверки
+используется ETag (If-None-Match).
+"""
+
+import asyncio
+import os
+import time
+
+import aiohttp
+
+# Сколько секунд ответ API матча считается свежим
+MATCH_CACHE_TTL = float(os.getenv("MATCH_CACHE_TTL", "5"))
+# Максимум одновременных соединений сессии
+HTTP_CONNECTION_LIMIT = int(os.getenv("HTTP_CONNECTION_LIMIT", "20"))
+# Время кэширования DNS и удержания keep-alive соединения (в секундах)
+HTTP_DNS_CACHE_TTL = 300
+HTTP_KEEPALIVE_TIMEOUT = 60
+# Общий таймаут запроса в секундах
+HTTP_TIMEOUT = 10
+
+
+class CachedResponse:
+    """Последний успешный ответ API"""
+
+    def __init__(self, data: dict, etag: str | None):
+        self.data = data
+        self.etag = etag
+        self.fetched_at = time.monotonic()
+
+    def is_fresh(self, ttl: float) -> bool:
+        return time.monotonic() - self.fetched_at < ttl
+
+
+class MatchClient:
+    """
+    Клиент API матча с общей сессией, коротким кэшем и объединением запросов.
+
+    Использование:
+        client = MatchClient(url)
+        status, data = await client.get_players()
+        await client.close()
+    """
+
+    def __init__(self, url: str, ttl: float = MATCH_CACHE_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._session: aiohttp.ClientSession | None = None
+        self._cached: CachedResponse | None = None
+        self._inflight: asyncio.Task | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_CONNECTION_LIMIT,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+            )
+        return self._session
+
+    async def get_players(self) -> tuple[int, dict | None]:
+        """
+        Возвращает (HTTP-статус, данные). Данные равны None, если статус не 200.
+
+        Ошибки соединения (aiohttp.ClientError, asyncio.TimeoutError) пробрасываются.
+        """
+        if self._cached is not None and self._cached.is_fresh(self.ttl):
+            return 200, self._cached.data
+
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._fetch())
+            self._inflight.add_done_callback(self._fetch_done)
+        # shield: отмена одной команды не должна отменять общий запрос
+        return await asyncio.shield(self._inflight)
+
+    def _fetch_done(self, task: asyncio.Task):
+        self._inflight = None
+        # Помечаем исключение как полученное, даже если его никто не ждал
+        if not task.cancelled():
+            task.exception()
+
+    async def _fetch(self) -> tuple[int, dict | None]:
+        headers = {}
+        if self._cached is not None and self._cached.etag:
+            headers["If-None-Match"] = self._cached.etag
+
+        async with self._get_session().get(self.url, headers=headers) as response:
+            if response.status == 304 and self._cached is not None:
+                # Данные не изменились - продлеваем жизнь кэша
+                self._cached.fetched_at = time.monotonic()
+                return 200, self._cached.data
+            if response.status != 200:
+                return response.status, None
+            data = await response.json()
+            self._cached = CachedResponse(data, response.headers.get("ETag"))
+        return 200, data
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Метрики бота: длительность этапов рендера и счетчики событий.
+
+Этапы замеряются через span("goto") и т.п. Метрики отдаются в текстовом
+формате Prometheus на локальном HTTP-порту (если задан METRICS_PORT)
+и кратко показываются командой !stats.
+"""
+
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# Порт HTTP-эндпоинта /metrics (пусто - эндпоинт выключен)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+# Адрес, на котором слушает эндпоинт (по умолчанию только локально)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Границы корзин гистограммы длительностей в секундах
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30)
+# Сколько последних замеров хранить для перцентилей в !stats
+RECENT_SAMPLES = 200
+
+REGISTRY = []
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    """Счетчик с метками"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values: dict[tuple, float] = {}
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Текущее значение с метками"""
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self.values[key] = value
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: tuple):
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+
+class Histogram:
+    """Гистограмма с метками (плюс последние замеры для перцентилей)"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.series: dict[tuple, _HistogramSeries] = {}
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = _HistogramSeries(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series.bucket_counts[i] += 1
+        series.count += 1
+        series.sum += value
+        series.recent.append(value)
+
+    def percentile(self, q: float, **labels) -> float | None:
+        """Перцентиль по последним замерам (q от 0 до 1)"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self.series.get(key)
+        if series is None or not series.recent:
+            return None
+        samples = sorted(series.recent)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series.bucket_counts):
+                labels = _format_labels(self.labelnames, key, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {series.count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+PHASE_SECONDS = Histogram("dpt_phase_seconds", "Длительность этапов обработки запроса", ("phase",))
+CACHE_REQUESTS = Counter("dpt_cache_requests_total", "Обращения к кэшу рендеров", ("cache", "result"))
+SCREENSHOT_FALLBACKS = Counter("dpt_screenshot_fallbacks_total",
+                               "Запасные варианты скриншота вместо вкладки Builds", ("kind",))
+ERRORS = Counter("dpt_errors_total", "Ошибки по месту и типу", ("where", "type"))
+BROWSER_RSS = Gauge("dpt_browser_rss_bytes", "Суммарная память (PSS) процессов Chromium")
+BROWSER_PROCESSES = Gauge("dpt_browser_processes", "Количество процессов Chromium")
+BROWSER_LIMITS = Gauge("dpt_browser_limit", "Настроенные лимиты браузера", ("limit",))
+BROWSER_RECYCLES = Counter("dpt_browser_recycles_total",
+                           "Пересоздания контекстов и перезапуски браузера", ("target", "reason"))
+
+
+@contextmanager
+def span(phase: str):
+    """Замеряет длительность блока и записывает ее в гистограмму этапов"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.observe(time.perf_counter() - start, phase=phase)
+
+
+def record_error(where: str, error: BaseException):
+    ERRORS.inc(where=where, type=type(error).__name__)
+
+
+def render_prometheus() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def stats_summary() -> list[str]:
+    """Краткая сводка для команды !stats"""
+    lines = []
+    for (phase,), series in sorted(PHASE_SECONDS.series.items()):
+        p50 = PHASE_SECONDS.percentile(0.5, phase=phase)
+        p95 = PHASE_SECONDS.percentile(0.95, phase=phase)
+        lines.append(f"`{phase}`: {series.count} шт., p50 {p50:.2f} с, p95 {p95:.2f} с")
+    for (cache, result), value in sorted(CACHE_REQUESTS.values.items()):
+        lines.append(f"Кэш `{cache}` {result}: {value:g}")
+    for (kind,), value in sorted(SCREENSHOT_FALLBACKS.values.items()):
+        lines.append(f"Запасной скриншот `{kind}`: {value:g}")
+    for (where, error_type), value in sorted(ERRORS.values.items()):
+        lines.append(f"Ошибки `{where}` {error_type}: {value:g}")
+    if BROWSER_RSS.values:
+        rss = BROWSER_RSS.values[()] / 1024 / 1024
+        lines.append(f"Chromium: {rss:.0f} МБ, процессов {BROWSER_PROCESSES.values.get((), 0):g}")
+    for (target, reason), value in sorted(BROWSER_RECYCLES.values.items()):
+        lines.append(f"Пересоздано `{target}` ({reason}): {value:g}")
+    return lines
+
+
+class MetricsServer:
+    """
+    Локальный HTTP-эндпоинт /metrics для Prometheus.
+
+    Использование:
+        server = MetricsServer(9100)
+        await server.start()
+        ...
+        await server.close()
+    """
+
+    def __init__(self, port: int = METRICS_PORT, host: str = METRICS_HOST):
+        self.port = port
+        self.host = host
+        self._runner: web.AppRunner | None = None
+
+    async def _handle(self, request):
+        return web.Response(text=render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        print(f"✓ Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Фоновый предварительный рендер скриншотов популярных героев.
+
+Планировщик считает, каких героев запрашивают чаще всего, и заранее
+обновляет их скриншоты в кэше, пока старые еще не устарели. Так в часы пик
+пользователи получают готовый файл из кэша, а не ждут рендер.
+"""
+
+import asyncio
+import os
+import random
+from collections import Counter
+
+# Интервал между проходами планировщика в секундах
+DEFAULT_INTERVAL = int(os.getenv("PRERENDER_INTERVAL", "300"))
+# Сколько самых популярных героев поддерживать свежими
+DEFAULT_TOP_N = int(os.getenv("PRERENDER_TOP_N", "25"))
+# Сколько фоновых рендеров может идти одновременно
+DEFAULT_CONCURRENCY = int(os.getenv("PRERENDER_CONCURRENCY", "1"))
+# За сколько секунд до истечения TTL скриншот нужно обновить
+DEFAULT_MARGIN = int(os.getenv("PRERENDER_MARGIN", "600"))
+# Герои, которые обновляются всегда, через запятую
+DEFAULT_HEROES = [h.strip() for h in os.getenv("PRERENDER_HEROES", "").split(",") if h.strip()]
+
+# Во сколько раз «остывает» счетчик запросов после каждого прохода
+DECAY = 0.5
+# Максимальная случайная задержка перед фоновым рендером в секундах
+MAX_JITTER = 5.0
+# Пауза перед повторной проверкой, если браузер занят пользовательскими запросами
+BUSY_BACKOFF = 2.0
+
+
+class PrerenderScheduler:
+    """
+    Планировщик фонового обновления кэша скриншотов.
+
+    Args:
+        cache: RenderCache со скриншотами
+        make_render: Функция make_render(hero_name), возвращающая функцию рендера для кэша
+        is_busy: Функция без аргументов; пока она возвращает True, фоновый рендер не запускается
+    """
+
+    def __init__(self, cache, make_render, is_busy=None,
+                 top_n: int = DEFAULT_TOP_N, interval: int = DEFAULT_INTERVAL,
+                 concurrency: int = DEFAULT_CONCURRENCY, margin: int = DEFAULT_MARGIN,
+                 heroes: list[str] | None = None):
+        self.cache = cache
+        self.make_render = make_render
+        self.is_busy = is_busy or (lambda: False)
+        self.top_n = top_n
+        self.interval = interval
+        self.margin = margin
+        self.heroes = list(DEFAULT_HEROES if heroes is None else heroes)
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._counts: Counter = Counter()
+        self._task: asyncio.Task | None = None
+
+    def record(self, hero_name: str):
+        """Учитывает пользовательский запрос героя"""
+        self._counts[hero_name] += 1
+
+    def hottest(self) -> list[str]:
+        """Самые популярные герои по недавним запросам"""
+        return [hero for hero, _ in self._counts.most_common(self.top_n)]
+
+    def start(self):
+        """Запускает фоновый цикл (повторный вызов ничего не делает)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            print(f"✓ Фоновый рендер запущен (топ {self.top_n}, раз в {self.interval} с)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # Небольшой разброс, чтобы проходы не совпадали с другими периодическими задачами
+            await asyncio.sleep(self.interval * random.uniform(0.9, 1.1))
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"⚠ Ошибка фонового рендера: {e}")
+
+    def _needs_refresh(self, hero_name: str) -> bool:
+        age = self.cache.age(hero_name)
+        return age is None or age > self.cache.ttl - self.margin
+
+    async def run_once(self):
+        """Один проход: обновляет героев, чьи скриншоты скоро устареют"""
+        candidates = list(dict.fromkeys(self.heroes + self.hottest()))
+        # Счетчики постепенно остывают, чтобы список отражал недавнюю популярность
+        self._counts = Counter({hero: count * DECAY for hero, count in self._counts.items()
+                                if count * DECAY >= 0.1})
+
+        stale = [hero for hero in candidates if self._needs_refresh(hero)]
+        if not stale:
+            return
+        print(f"🔄 Фоновое обновление скриншотов: {', '.join(stale)}")
+        await asyncio.gather(*(self._refresh(hero) for hero in stale))
+
+    async def _refresh(self, hero_name: str):
+        async with self._semaphore:
+            await asyncio.sleep(random.uniform(0, MAX_JITTER))
+            # Пользовательские запросы важнее - ждем, пока браузер освободится
+            while self.is_busy():
+                await asyncio.sleep(BUSY_BACKOFF)
+            # Кто-то мог обновить скриншот, пока мы ждали
+            if not self._needs_refresh(hero_name):
+                return
+            try:
+                await self.cache.get_or_render(hero_name, self.make_render(hero_name), force=True)
+            except Exception as e:
+                print(f"⚠ Не удалось обновить скриншот для {hero_name}: {e}")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Память дочерних процессов по данным /proc (только Linux).
+
+Используется пулом браузера, чтобы следить за памятью Chromium, и бенчмарком.
+На других системах функции возвращают None.
+"""
+
+import os
+from pathlib import Path
+
+PROC = Path("/proc")
+
+
+def read_processes() -> dict[int, tuple[int, str, int]] | None:
+    """pid -> (ppid, имя, RSS в байтах) для всех процессов"""
+    if not (PROC / "self").exists():
+        return None
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    processes = {}
+    for entry in PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            rss_pages = int((entry / "statm").read_text().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        # Имя процесса в скобках может содержать пробелы
+        name = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        processes[int(entry.name)] = (ppid, name, rss_pages * page_size)
+    return processes
+
+
+def descendants(processes: dict, root: int) -> set[int]:
+    """Все потомки процесса root (без него самого)"""
+    children: dict[int, list[int]] = {}
+    for pid, (ppid, _, _) in processes.items():
+        children.setdefault(ppid, []).append(pid)
+    found = set()
+    stack = [root]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            if child not in found:
+                found.add(child)
+                stack.append(child)
+    return found
+
+
+def _status_kb(path: Path, field: str) -> int | None:
+    """Значение поля в килобайтах из /proc/<pid>/smaps_rollup или status"""
+    for line in path.read_text().splitlines():
+        if line.startswith(field + ":"):
+            return int(line.split()[1])
+    return None
+
+
+def process_memory(pid: int, fallback: int = 0) -> int:
+    """
+    Память процесса в байтах без двойного учета общих страниц.
+
+    PSS из smaps_rollup делит общие страницы (бинарник Chromium, общая память)
+    между процессами, поэтому сумма по процессам не завышена. Без smaps_rollup
+    (старые ядра) берется RssAnon из status, а без него - fallback (RSS из statm).
+    """
+    for name, field in (("smaps_rollup", "Pss"), ("status", "RssAnon")):
+        try:
+            value = _status_kb(PROC / str(pid) / name, field)
+        except (OSError, ValueError, IndexError):
+            continue
+        if value is not None:
+            return value * 1024
+    return fallback
+
+
+def is_chromium(name: str) -> bool:
+    return "chrom" in name or "headless" in name
+
+
+def chromium_usage(root: int | None = None) -> tuple[int, int] | None:
+    """
+    Суммарная память (PSS) и количество процессов Chromium, запущенных этим процессом.
+
+    Общие страницы делятся между процессами (см. process_memory), иначе
+    бинарник и общая память Chromium учитывались бы в каждом процессе и
+    даже свежий браузер превышал бы лимит.
+    """
+    processes = read_processes()
+    if processes is None:
+        return None
+    rss = 0
+    count = 0
+    for pid in descendants(processes, root or os.getpid()):
+        _, name, process_rss = processes[pid]
+        if is_chromium(name):
+            rss += process_memory(pid, fallback=process_rss)
+            count += 1
+    return rss, count
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Определение момента, когда вкладку Builds можно снимать.
+
+Вместо фиксированных пауз (wait_for_timeout) страница сама сообщает
+о готовности: контейнер Builds появился, имеет ненулевой размер, и в течение
+«окна тишины» внутри него не было изменений и не завершались запросы, которые
+могут на него повлиять (данные и скрипты сайта, картинки контейнера).
+Если страница так и не успокоилась, по жесткому дедлайну снимается то, что есть.
+"""
+
+import os
+
+# Селектор контейнера с билдами
+BUILDS_SELECTOR = ".flex.flex-col.gap-1"
+
+# Жесткий дедлайн ожидания готовности в миллисекундах
+READY_DEADLINE_MS = int(os.getenv("READY_DEADLINE_MS", "8000"))
+# Дедлайн ожидания картинок после прокрутки в миллисекундах
+SETTLE_DEADLINE_MS = int(os.getenv("SETTLE_DEADLINE_MS", "1500"))
+
+# Выполняется в браузере и завершается, когда контейнер готов или истек дедлайн
+READY_SCRIPT = """({ selector, quietMs, deadlineMs }) => new Promise((resolve) => {
+    const start = performance.now();
+    let lastActivity = start;
+    let lastBox = null;
+    let observed = null;
+
+    const measure = (el) => {
+        if (!el) return null;
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) return null;
+        return {
+            x: rect.x + window.scrollX,
+            y: rect.y + window.scrollY,
+            width: rect.width,
+            height: rect.height
+        };
+    };
+
+    // Окно тишины сбрасывают только изменения внутри контейнера Builds и запросы,
+    // которые могут на него повлиять: посторонние виджеты, счетчики и маяки
+    // аналитики не должны растягивать ожидание до дедлайна
+    const touch = () => { lastActivity = performance.now(); };
+    const mutations = new MutationObserver(touch);
+    const observe = (el) => {
+        mutations.disconnect();
+        mutations.observe(el, {
+            childList: true,
+            subtree: true,
+            characterData: true,
+            attributes: true,
+            attributeFilter: ['class', 'style', 'src'],
+        });
+        observed = el;
+        touch();
+    };
+
+    const affectsBuilds = (entry) => {
+        const type = entry.initiatorType;
+        if (type === 'fetch' || type === 'xmlhttprequest' || type === 'script') {
+            // Данные и чанки сайта - со своего домена; сторонние запросы - не наши
+            try {
+                return new URL(entry.name).origin === location.origin;
+            } catch {
+                return false;
+            }
+        }
+        if (type === 'img' && observed) {
+            return Array.from(observed.querySelectorAll('img'))
+                .some((img) => img.currentSrc === entry.name || img.src === entry.name);
+        }
+        return false;
+    };
+    const network = new PerformanceObserver((list) => {
+        if (list.getEntries().some(affectsBuilds)) touch();
+    });
+    try {
+        network.observe({ type: 'resource' });
+    } catch {}
+
+    const finish = (box, reason) => {
+        mutations.disconnect();
+        network.disconnect();
+        resolve({ box, reason, elapsed: Math.round(performance.now() - start) });
+    };
+
+    const tick = () => {
+        const now = performance.now();
+        const el = document.querySelector(selector);
+        // Контейнер появился или был заменен - следим за новым
+        if (el && el !== observed) observe(el);
+        const box = measure(el);
+        if (box) {
+            // Изменение размеров контейнера - тоже признак того, что он еще рендерится
+            if (!lastBox || box.width !== lastBox.width || box.height !== lastBox.height) {
+                lastActivity = now;
+            }
+            lastBox = box;
+            if (now - lastActivity >= quietMs) return finish(box, 'ready');
+        }
+        if (now - start >= deadlineMs) return finish(box, 'deadline');
+        setTimeout(tick, 50);
+    };
+    tick();
+})"""
+
+# Прокручивает к контейнеру и ждет загрузки картинок внутри него
+SETTLE_SCRIPT = """({ selector, top, deadlineMs }) => new Promise((resolve) => {
+    window.scrollTo(0, top);
+    const start = performance.now();
+    const check = () => {
+        const el = document.querySelector(selector);
+        const images = el ? Array.from(el.querySelectorAll('img')) : [];
+        const loaded = images.every((img) => img.complete);
+        if (loaded || performance.now() - start >= deadlineMs) {
+            // Два кадра, чтобы браузер успел отрисовать загруженные картинки
+            requestAnimationFrame(() => requestAnimationFrame(() => resolve(loaded)));
+            return;
+        }
+        setTimeout(check, 50);
+    };
+    check();
+})"""
+
+
+async def wait_for_builds_ready(page, quiet_ms: int, deadline_ms: int = READY_DEADLINE_MS,
+                                selector: str = BUILDS_SELECTOR) -> dict | None:
+    """
+    Ждет готовности контейнера Builds за один вызов в браузер.
+
+    Args:
+        page: Страница Playwright (async API)
+        quiet_ms: Окно тишины - сколько миллисекунд страница не должна меняться
+        deadline_ms: Максимальное время ожидания
+        selector: Селектор контейнера
+
+    Returns:
+        Координаты контейнера (x, y, width, height) или None, если он так и не появился
+    """
+    result = await page.evaluate(READY_SCRIPT, {
+        "selector": selector,
+        "quietMs": quiet_ms,
+        "deadlineMs": deadline_ms,
+    })
+    if result["reason"] == "ready":
+        print(f"✓ Контент вкладки Builds готов за {result['elapsed']} мс")
+    elif result["box"]:
+        print(f"⚠ Страница не успокоилась за {result['elapsed']} мс, снимаю как есть")
+    return result["box"]
+
+
+async def scroll_and_settle(page, top: float, deadline_ms: int = SETTLE_DEADLINE_MS,
+                            selector: str = BUILDS_SELECTOR) -> bool:
+    """Прокручивает страницу и ждет загрузки картинок в контейнере. Возвращает True, если все загрузилось"""
+    return await page.evaluate(SETTLE_SCRIPT, {
+        "selector": selector,
+        "top": top,
+        "deadlineMs": deadline_ms,
+    })
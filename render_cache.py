@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Кэш готовых скриншотов героев.
+
+Это единственное место, где скриншоты попадают на диск. Файлы лежат в папке
+скриншотов, а индекс (время создания и последнего обращения) сохраняется
+рядом в JSON, поэтому кэш переживает перезапуск бота.
+Устаревшие записи определяются по TTL, при переполнении удаляются давно
+не использованные (LRU). Одновременные запросы одного и того же героя ждут
+один общий рендер.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from metrics import CACHE_REQUESTS
+
+# Время жизни скриншота в секундах
+DEFAULT_TTL = int(os.getenv("SCREENSHOT_CACHE_TTL", "3600"))
+# Максимальное количество файлов в кэше
+DEFAULT_MAX_ENTRIES = int(os.getenv("SCREENSHOT_CACHE_MAX_ENTRIES", "200"))
+# Максимальный суммарный размер файлов в мегабайтах
+DEFAULT_MAX_MB = int(os.getenv("SCREENSHOT_CACHE_MAX_MB", "200"))
+
+INDEX_FILENAME = ".cache_index.json"
+
+
+def normalize_key(name: str) -> str:
+    """Приводит название героя к ключу кэша"""
+    return " ".join(name.lower().split())
+
+
+class RenderCache:
+    """
+    Кэш отрендеренных файлов с TTL, LRU-вытеснением и дедупликацией рендеров.
+
+    Функция рендера возвращает байты результата. Если она вернула None,
+    результат считается неудачным и не кэшируется.
+    """
+
+    def __init__(self, directory: str, ttl: int = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024,
+                 suffix: str = ".png", name: str | None = None):
+        self.directory = Path(directory)
+        # Имя кэша в метриках
+        self.name = name or self.directory.name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._index_path = self.directory / INDEX_FILENAME
+        # ключ -> {"file", "size", "created", "last_access"}
+        self._entries: dict[str, dict] = {}
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"⚠ Не удалось прочитать индекс кэша, начинаю с пустого: {e}")
+            return
+        # Оставляем только записи, файлы которых все еще на диске
+        # (и в текущем формате - он мог смениться между запусками)
+        for key, entry in entries.items():
+            path = self.directory / entry["file"]
+            if path.suffix == self.suffix and path.exists():
+                self._entries[key] = entry
+        print(f"✓ Кэш скриншотов загружен: {len(self._entries)} записей")
+
+    def _save_index(self):
+        tmp_path = self._index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self._index_path)
+
+    def path_for(self, key: str) -> Path:
+        """Путь к файлу в кэше (без опасных для файловой системы символов)"""
+        safe_name = re.sub(r"[^\w-]+", "_", key)
+        return self.directory / f"{safe_name}{self.suffix}"
+
+    def age(self, key: str) -> float | None:
+        """Возраст записи в секундах или None, если записи нет"""
+        entry = self._entries.get(normalize_key(key))
+        if entry is None:
+            return None
+        return time.time() - entry["created"]
+
+    async def get(self, key: str) -> bytes | None:
+        """Возвращает содержимое свежего файла из кэша или None"""
+        key = normalize_key(key)
+        entry = self._entries.get(key)
+        if entry is None or time.time() - entry["created"] > self.ttl:
+            return None
+        try:
+            data = await asyncio.to_thread((self.directory / entry["file"]).read_bytes)
+        except FileNotFoundError:
+            return None
+        # Время обращения нужно только для LRU: обновляем в памяти, а на диск
+        # оно попадет при следующем put, без записи индекса на каждое чтение
+        entry["last_access"] = time.time()
+        return data
+
+    async def get_or_render(self, key: str, render, force: bool = False) -> bytes | None:
+        """
+        Возвращает содержимое из кэша, при необходимости запуская рендер.
+
+        Args:
+            key: Название героя
+            render: Асинхронная функция без аргументов, возвращающая байты или None
+            force: Перерендерить даже свежую запись
+        """
+        key = normalize_key(key)
+        if not force:
+            data = await self.get(key)
+            if data is not None:
+                CACHE_REQUESTS.inc(cache=self.name, result="hit")
+                print(f"✓ Скриншот для {key} взят из кэша")
+                return data
+
+        task = self._inflight.get(key)
+        if task is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result="shared")
+        elif not force:
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+        if task is None:
+            task = asyncio.create_task(self._render(key, render))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._render_done(key, t))
+        else:
+            print(f"⏳ Рендер для {key} уже выполняется, жду его результата")
+        # shield: отмена одного ожидающего не должна отменять общий рендер
+        return await asyncio.shield(task)
+
+    def _render_done(self, key: str, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Помечаем исключение как полученное, даже если его никто не ждал
+        if not task.cancelled():
+            task.exception()
+
+    async def _render(self, key: str, render) -> bytes | None:
+        data = await render()
+        if not data:
+            return None
+        await self.put(key, data)
+        return data
+
+    async def put(self, key: str, data: bytes):
+        """Сохраняет готовый результат (например, из пакетного рендера)"""
+        key = normalize_key(key)
+        path = self.path_for(key)
+        await asyncio.to_thread(self._write_file, path, data)
+
+        now = time.time()
+        self._entries[key] = {
+            "file": path.name,
+            "size": len(data),
+            "created": now,
+            "last_access": now,
+        }
+        self._evict(keep=key)
+        self._save_index()
+
+    def _write_file(self, path: Path, data: bytes):
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{time.monotonic_ns()}.tmp{self.suffix}")
+        try:
+            tmp_path.write_bytes(data)
+            # Атомарная замена: читатели никогда не видят недописанный файл
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _evict(self, keep: str):
+        """Удаляет давно не использованные записи, пока кэш не уложится в лимиты"""
+        total = sum(entry["size"] for entry in self._entries.values())
+        by_access = sorted(self._entries, key=lambda k: self._entries[k]["last_access"])
+        for key in by_access:
+            if len(self._entries) <= self.max_entries and total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = self._entries.pop(key)
+            total -= entry["size"]
+            try:
+                (self.directory / entry["file"]).unlink()
+            except FileNotFoundError:
+                pass
+            print(f"🗑 Удален из кэша: {key}")
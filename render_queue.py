@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Очередь рендеров с ограничением нагрузки.
+
+Одновременно выполняется не больше RENDER_CONCURRENCY рендеров (по числу
+страниц браузера), остальные ждут в ограниченной очереди. Очередь обходится
+по кругу между серверами (гильдиями), поэтому один активный сервер не может
+занять браузер целиком. Если очередь заполнена, запрос сразу отклоняется
+(QueueFullError), а не копится до OOM.
+"""
+
+import asyncio
+import os
+import time
+from collections import Counter, OrderedDict, deque
+
+from metrics import PHASE_SECONDS
+
+# Сколько рендеров может идти одновременно (по умолчанию - размер пула браузера)
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", os.getenv("BROWSER_POOL_SIZE", "2")))
+# Максимальное количество ожидающих рендеров
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "20"))
+# Сколько рендеров один пользователь может держать в очереди и в работе
+RENDER_QUEUE_PER_USER = int(os.getenv("RENDER_QUEUE_PER_USER", "2"))
+
+
+class QueueFullError(Exception):
+    """Очередь рендеров переполнена - запрос отклонен"""
+
+
+class _Job:
+    def __init__(self, key: str, user, factory, on_position):
+        self.key = key
+        self.user = user
+        self.factory = factory
+        self.on_position = on_position
+        self.future = asyncio.get_running_loop().create_future()
+        self.submitted = time.perf_counter()
+        # 0 - выполняется или еще не стоял в очереди
+        self.position = 0
+
+
+class RenderScheduler:
+    """
+    Планировщик рендеров с ограничением параллелизма и справедливой очередью.
+
+    Использование:
+        scheduler = RenderScheduler()
+        result = await scheduler.submit(guild_id, make_job, user=user_id, on_position=callback)
+
+    Args:
+        concurrency: Сколько рендеров выполняется одновременно
+        max_queue: Максимальная длина очереди
+        max_per_user: Сколько заданий один пользователь может держать в очереди и в работе
+    """
+
+    def __init__(self, concurrency: int = RENDER_CONCURRENCY, max_queue: int = RENDER_QUEUE_SIZE,
+                 max_per_user: int = RENDER_QUEUE_PER_USER):
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.running = 0
+        # ключ очереди (сервер) -> задания в порядке поступления
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._per_user: Counter = Counter()
+        self._tasks: set[asyncio.Task] = set()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(jobs) for jobs in self._queues.values())
+
+    @property
+    def busy(self) -> bool:
+        """True, если новый рендер не начнется сразу"""
+        return self.running >= self.concurrency or self.queued > 0
+
+    async def submit(self, key: str, factory, user=None, on_position=None):
+        """
+        Ставит рендер в очередь и ждет его результата.
+
+        Args:
+            key: Ключ справедливости (например, id сервера); очереди обходятся по кругу
+            factory: Функция без аргументов, возвращающая корутину рендера
+            user: Идентификатор пользователя для ограничения числа его заданий
+            on_position: Асинхронная функция on_position(position), вызывается при
+                изменении места в очереди (0 - рендер начался)
+
+        Raises:
+            QueueFullError: Очередь переполнена или у пользователя слишком много заданий
+        """
+        if self.queued >= self.max_queue:
+            raise QueueFullError("очередь рендеров переполнена")
+        if user is not None and self._per_user[user] >= self.max_per_user:
+            raise QueueFullError("слишком много запросов от одного пользователя")
+
+        job = _Job(key, user, factory, on_position)
+        self._queues.setdefault(key, deque()).append(job)
+        if user is not None:
+            self._per_user[user] += 1
+        self._dispatch()
+        try:
+            return await job.future
+        except asyncio.CancelledError:
+            self._forget(job)
+            raise
+
+    def _forget(self, job: _Job):
+        """Убирает отмененное задание из очереди, если оно еще не началось"""
+        jobs = self._queues.get(job.key)
+        if jobs is not None and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del self._queues[job.key]
+            self._release_user(job)
+            self._notify_positions()
+
+    def _release_user(self, job: _Job):
+        if job.user is not None:
+            self._per_user[job.user] -= 1
+            if self._per_user[job.user] <= 0:
+                del self._per_user[job.user]
+
+    def _dispatch(self):
+        while self.running < self.concurrency and self._queues:
+            # Берем задание из первой очереди и переносим ее в конец (обход по кругу)
+            key, jobs = self._queues.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                self._queues[key] = jobs
+            self.running += 1
+            PHASE_SECONDS.observe(time.perf_counter() - job.submitted, phase="queue_wait")
+            self._notify(job, 0)
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._notify_positions()
+
+    async def _run(self, job: _Job):
+        try:
+            result = await job.factory()
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.running -= 1
+            self._release_user(job)
+            self._dispatch()
+
+    def _notify_positions(self):
+        """Пересчитывает места в очереди в порядке обхода по кругу"""
+        queues = list(self._queues.values())
+        position = 0
+        for depth in range(max((len(jobs) for jobs in queues), default=0)):
+            for jobs in queues:
+                if depth < len(jobs):
+                    position += 1
+                    self._notify(jobs[depth], position)
+
+    def _notify(self, job: _Job, position: int):
+        if position == job.position or job.on_position is None:
+            job.position = position
+            return
+        job.position = position
+        task = asyncio.create_task(self._call_on_position(job, position))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _call_on_position(self, job: _Job, position: int):
+        # Место могло снова измениться, пока уведомление ждало своей очереди
+        if job.position != position:
+            return
+        try:
+            await job.on_position(position)
+        except Exception as e:
+            print(f"⚠ Не удалось обновить место в очереди: {e}")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Воркер рендера: берет задания из очереди (job_queue.py), рендерит их
+в своем браузере и возвращает байты результата боту.
+
+При RENDER_BACKEND=inprocess воркер работает внутри процесса бота. Для
+socket и redis воркеры запускаются отдельно, в том числе в других
+контейнерах, и добавляют мощность независимо от бота:
+
+    RENDER_BACKEND=socket RENDER_QUEUE_ADDR=bot:8765 python render_worker.py
+    RENDER_BACKEND=redis RENDER_WORKER_PROCESSES=4 python render_worker.py
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения из .env файла
+load_dotenv()
+
+from browser_pool import BrowserPool, DEFAULT_POOL_SIZE
+from screenshot_hero import (screenshot_hero_async, screenshot_heroes_async, extract_builds_async,
+                             ensure_browser_installed)
+from image_encoding import encode_image
+from job_queue import RENDER_BACKEND, connect_worker, pack_parts
+from metrics import METRICS_PORT, MetricsServer, record_error, span
+
+# Сколько процессов-воркеров запустить (у каждого свой браузер с пулом страниц)
+RENDER_WORKER_PROCESSES = int(os.getenv("RENDER_WORKER_PROCESSES", "1"))
+# Пауза перед повторным подключением к очереди (в секундах)
+RECONNECT_DELAY = 3
+# Сколько раз повторить задание, если браузер или вкладка упали во время рендера
+RENDER_RETRIES = 1
+
+
+async def render_job(pool: BrowserPool, job: dict) -> bytes | None:
+    """
+    Выполняет одно задание.
+
+    Returns:
+        Изображение (hero), JSON билдов (builds) или упакованные pack_parts
+        изображения (heroes); None, если рендер не удался
+    """
+    hero = job["hero"]
+    if job["kind"] == "hero":
+        # Берем страницу из пула уже запущенного браузера
+        with span("render"):
+            async with pool.page() as page:
+                image = await screenshot_hero_async(
+                    page,
+                    hero,
+                    200  # wait_time: окно тишины страницы, мс
+                )
+        if image is None:
+            return None
+        # Пересжатие нагружает CPU - выполняем его вне event loop
+        with span("encode"):
+            return await asyncio.to_thread(encode_image, image)
+    if job["kind"] == "builds":
+        async with pool.page() as page:
+            builds = await extract_builds_async(page, hero, 200)
+        # Пустой результат не кэшируем - возможно, страница загрузилась не полностью
+        if builds is None or not builds.builds:
+            return None
+        return builds.to_json()
+    if job["kind"] == "heroes":
+        # Один контекст на все страницы: согласие закрывается один раз
+        with span("render_batch"):
+            async with pool.pages(len(hero)) as pages:
+                # Страниц не больше размера пула - лишних героев рендерим следующими партиями
+                images = []
+                for start in range(0, len(hero), len(pages)):
+                    images += await screenshot_heroes_async(pages, hero[start:start + len(pages)], 200)
+        with span("encode"):
+            encoded = [await asyncio.to_thread(encode_image, image) if image else None for image in images]
+        return pack_parts(encoded)
+    raise ValueError(f"Неизвестный тип задания: {job['kind']}")
+
+
+async def render_with_retry(pool: BrowserPool, job: dict) -> bytes | None:
+    """Выполняет задание; после сбоя повторяет его на пересозданной странице"""
+    for attempt in range(RENDER_RETRIES + 1):
+        try:
+            return await render_job(pool, job)
+        except Exception as e:
+            if attempt == RENDER_RETRIES:
+                raise
+            print(f"⚠ Сбой рендера {job['kind']} {job['hero']} ({e}), повторяю")
+
+
+async def serve(connection, pool: BrowserPool):
+    """Выполняет задания из подключения к очереди одно за другим"""
+    while True:
+        job = await connection.next_job()
+        try:
+            data = await render_with_retry(pool, job)
+        except Exception as e:
+            record_error("render_worker", e)
+            print(f"✗ Ошибка задания {job['kind']} {job['hero']}: {e}")
+            await connection.complete(job, error=str(e) or type(e).__name__)
+        else:
+            await connection.complete(job, data)
+
+
+def start_workers(queue, pool: BrowserPool, count: int) -> list[asyncio.Task]:
+    """Запускает воркеры внутри процесса бота (бэкенд inprocess)"""
+    return [asyncio.create_task(serve(queue, pool)) for _ in range(count)]
+
+
+async def _serve_forever(backend: str, pool: BrowserPool):
+    while True:
+        connection = None
+        try:
+            connection = await connect_worker(backend)
+            await serve(connection, pool)
+        except Exception as e:
+            print(f"⚠ Нет связи с очередью рендеров ({e}), переподключаюсь через {RECONNECT_DELAY} с")
+        finally:
+            if connection is not None:
+                await connection.close()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def run_worker(backend: str = RENDER_BACKEND, pages: int = DEFAULT_POOL_SIZE, index: int = 0):
+    """Отдельный воркер: свой браузер, по одному подключению к очереди на страницу пула"""
+    pool = BrowserPool(size=pages)
+    await pool.start()
+    # У каждого процесса свой порт метрик: METRICS_PORT, METRICS_PORT + 1, ...
+    metrics_server = MetricsServer(METRICS_PORT + index if METRICS_PORT else 0)
+    await metrics_server.start()
+    print(f"✓ Воркер рендера {index} запущен ({backend}, {pages} стр.)")
+    try:
+        await asyncio.gather(*(_serve_forever(backend, pool) for _ in range(pages)))
+    finally:
+        await metrics_server.close()
+        await pool.close()
+
+
+def _process_main(index: int):
+    try:
+        asyncio.run(run_worker(index=index))
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    if RENDER_BACKEND == "inprocess":
+        print("❌ При RENDER_BACKEND=inprocess рендер выполняется в процессе бота. "
+              "Для отдельных воркеров укажите RENDER_BACKEND=socket или redis")
+        return
+    if not ensure_browser_installed():
+        sys.exit(1)
+    if RENDER_WORKER_PROCESSES <= 1:
+        _process_main(0)
+        return
+    processes = [
+        multiprocessing.Process(target=_process_main, args=(index,), daemon=True)
+        for index in range(RENDER_WORKER_PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Фильтр сетевых запросов страницы при создании скриншота.
+
+Реклама, аналитика и тяжелые ресурсы (видео) блокируются, а статические
+JS/CSS/шрифты отдаются из локального кэша на диске, чтобы страница
+загружалась быстрее и не тратила трафик.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+# Включить фильтр запросов (0 - отключить)
+REQUEST_FILTER_ENABLED = os.getenv("REQUEST_FILTER", "1") != "0"
+
+# Типы ресурсов, которые не загружаются вообще
+BLOCKED_RESOURCE_TYPES = {
+    t.strip() for t in os.getenv("BLOCKED_RESOURCE_TYPES", "media").split(",") if t.strip()
+}
+
+DEFAULT_BLOCKED_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googletagservices.com",
+    "googletagmanager.com",
+    "google-analytics.com",
+    "adservice.google.com",
+    "amazon-adsystem.com",
+    "adnxs.com",
+    "criteo.com",
+    "criteo.net",
+    "pubmatic.com",
+    "rubiconproject.com",
+    "openx.net",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "facebook.net",
+    "clarity.ms",
+    "mc.yandex.ru",
+]
+
+# Домены рекламы и аналитики (запросы к ним и их поддоменам блокируются)
+BLOCKED_DOMAINS = [
+    d.strip().lower() for d in os.getenv("BLOCKED_DOMAINS", ",".join(DEFAULT_BLOCKED_DOMAINS)).split(",")
+    if d.strip()
+]
+
+# Локальный кэш статических ресурсов (по умолчанию в томе со скриншотами)
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR", os.path.join("screenshots", "asset_cache"))
+ASSET_CACHE_TYPES = {"script", "stylesheet", "font"}
+# Сколько хранить ресурс, если сервер не указал время жизни (в секундах)
+ASSET_CACHE_DEFAULT_TTL = int(os.getenv("ASSET_CACHE_DEFAULT_TTL", "86400"))
+# Максимальный размер кэша ресурсов в мегабайтах
+ASSET_CACHE_MAX_MB = int(os.getenv("ASSET_CACHE_MAX_MB", "100"))
+
+# Заголовки, которые не имеет смысла сохранять и отдавать из кэша
+SKIPPED_HEADERS = {"content-length", "content-encoding", "transfer-encoding", "connection", "set-cookie"}
+
+
+class RequestStats:
+    """Счетчики запросов страницы за один рендер"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.blocked = 0
+        self.cached = 0
+        self.fetched = 0
+        self.passed = 0
+
+    def summary(self) -> str:
+        return (f"заблокировано {self.blocked}, из кэша {self.cached}, "
+                f"загружено в кэш {self.fetched}, пропущено {self.passed}")
+
+
+def is_blocked_domain(url: str) -> bool:
+    host = (urlsplit(url).hostname or "").lower()
+    return any(host == domain or host.endswith("." + domain) for domain in BLOCKED_DOMAINS)
+
+
+def cache_ttl(headers: dict) -> int | None:
+    """Время жизни ресурса по заголовкам ответа; None - ресурс нельзя кэшировать"""
+    cache_control = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return None
+    match = re.search(r"max-age=(\d+)", cache_control)
+    if match:
+        ttl = int(match.group(1))
+        return ttl if ttl > 0 else None
+    if "expires" in headers:
+        try:
+            ttl = int(parsedate_to_datetime(headers["expires"]).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+        return ttl if ttl > 0 else None
+    return ASSET_CACHE_DEFAULT_TTL
+
+
+class AssetCache:
+    """
+    Кэш статических ресурсов на диске с ключом по URL.
+
+    Устаревшие ресурсы удаляются при старте и при переполнении, а если кэш
+    все еще больше max_bytes - удаляются давно не использованные (LRU по
+    времени изменения файла метаданных, которое обновляется при чтении).
+    """
+
+    def __init__(self, directory: str = ASSET_CACHE_DIR,
+                 max_bytes: int = ASSET_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        # Примерный суммарный размер тел ресурсов, уточняется при каждой чистке
+        self._size = 0
+        self._sweep()
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.directory / f"{key}.body", self.directory / f"{key}.json"
+
+    def _read(self, url: str):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["expires"] < time.time():
+                self._remove(body_path, meta_path)
+                return None
+            body = body_path.read_bytes()
+            # Отмечаем обращение для LRU
+            os.utime(meta_path)
+            return meta["status"], meta["headers"], body
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, url: str, status: int, headers: dict, body: bytes, ttl: int):
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in SKIPPED_HEADERS},
+            "expires": time.time() + ttl,
+        }
+        # Один и тот же ресурс могут параллельно загружать несколько страниц:
+        # оба файла пишутся во временные и атомарно заменяются, чтобы читатель
+        # никогда не получил обрезанный JS/CSS
+        self._replace(body_path, body)
+        # Метаданные пишутся последними: без них тело ресурса не используется
+        self._replace(meta_path, json.dumps(meta).encode("utf-8"))
+        self._size += len(body)
+        if self._size > self.max_bytes:
+            self._sweep()
+
+    def _replace(self, path: Path, data: bytes):
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def _remove(self, body_path: Path, meta_path: Path):
+        for path in (meta_path, body_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _sweep(self):
+        """Удаляет устаревшие ресурсы и давно не использованные сверх лимита"""
+        now = time.time()
+        # Временные файлы, оставшиеся после прерванной записи
+        for tmp_path in self.directory.glob("*.tmp"):
+            try:
+                if now - tmp_path.stat().st_mtime > 60:
+                    tmp_path.unlink()
+            except FileNotFoundError:
+                pass
+        entries = []
+        for body_path in self.directory.glob("*.body"):
+            meta_path = body_path.with_suffix(".json")
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    expires = json.load(f)["expires"]
+                used = meta_path.stat().st_mtime
+                size = body_path.stat().st_size
+            except (OSError, ValueError, KeyError):
+                # Тело без метаданных (запись прервалась) или битые метаданные
+                expires = 0
+            if expires < now:
+                self._remove(body_path, meta_path)
+            else:
+                entries.append((used, size, body_path, meta_path))
+        total = sum(size for _, size, _, _ in entries)
+        removed = 0
+        for _, size, body_path, meta_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(body_path, meta_path)
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            print(f"🗑 Кэш ресурсов: удалено {removed} давно не использованных файлов")
+
+    async def get(self, url: str):
+        """Возвращает (status, headers, body) или None"""
+        return await asyncio.to_thread(self._read, url)
+
+    async def put(self, url: str, status: int, headers: dict, body: bytes) -> bool:
+        ttl = cache_ttl(headers)
+        if status != 200 or ttl is None:
+            return False
+        await asyncio.to_thread(self._write, url, status, headers, body, ttl)
+        return True
+
+
+# Счетчики для каждой страницы, на которую установлен фильтр
+_page_stats: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_asset_cache: AssetCache | None = None
+
+
+def stats_for(page) -> RequestStats | None:
+    """Счетчики запросов страницы или None, если фильтр не установлен"""
+    return _page_stats.get(page)
+
+
+async def _handle_route(route, stats: RequestStats, cache: AssetCache):
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or is_blocked_domain(request.url):
+        stats.blocked += 1
+        await route.abort()
+        return
+
+    if request.method == "GET" and request.resource_type in ASSET_CACHE_TYPES:
+        hit = await cache.get(request.url)
+        if hit is not None:
+            status, headers, body = hit
+            stats.cached += 1
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            stats.passed += 1
+            await route.continue_()
+            return
+        if await cache.put(request.url, response.status, response.headers, body):
+            stats.fetched += 1
+        else:
+            stats.passed += 1
+        await route.fulfill(response=response, body=body)
+        return
+
+    stats.passed += 1
+    await route.continue_()
+
+
+async def install_request_filter(page) -> RequestStats | None:
+    """Включает фильтр запросов на странице Playwright (async API)"""
+    global _asset_cache
+    if not REQUEST_FILTER_ENABLED:
+        return None
+    if _asset_cache is None:
+        _asset_cache = AssetCache()
+    stats = RequestStats()
+    cache = _asset_cache
+
+    async def handler(route):
+        try:
+            await _handle_route(route, stats, cache)
+        except Exception as e:
+            # Маршрут мог быть уже обработан (например, страница закрылась)
+            print(f"⚠ Ошибка фильтра запросов: {e}")
+
+    await page.route("**/*", handler)
+    _page_stats[page] = stats
+    return stats
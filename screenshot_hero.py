@@ -6,18 +6,86 @@
 
 import sys
 import os
+import asyncio
+from importlib import metadata
 from pathlib import Path
-from playwright.sync_api import sync_playwright
+from urllib.parse import quote
 
+from browser_pool import BrowserPool
+from dom_probe import SELECTOR_GROUPS, probe_and_click
+from request_filter import stats_for
+from readiness import BUILDS_SELECTOR, wait_for_builds_ready, scroll_and_settle
+from builds_parser import HeroBuilds, parse_builds_html
+from metrics import span, SCREENSHOT_FALLBACKS, record_error
 
-def ensure_browser_installed():
-    """Проверяет и устанавливает браузер Chromium, если он не установлен"""
+# Адрес сайта (для бенчмарка можно указать локальный сервер, см. benchmark.py)
+DOTA2PROTRACKER_URL = os.getenv("DOTA2PROTRACKER_URL", "https://dota2protracker.com").rstrip("/")
+
+
+# Результат проверки браузера в этом процессе (None - еще не проверялся)
+_browser_installed: bool | None = None
+_install_task: asyncio.Future | None = None
+
+
+def hero_url(hero_name: str) -> str:
+    """Адрес страницы героя (в названиях героев бывают пробелы и апострофы)"""
+    return f"{DOTA2PROTRACKER_URL}/hero/{quote(hero_name.lower())}"
+
+
+def _browser_marker() -> Path:
+    """Файл-отметка об успешной проверке Chromium для текущей версии Playwright"""
+    try:
+        version = metadata.version("playwright")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    # Отметка лежит рядом с браузерами: удалили браузеры - пропала и отметка
+    browsers_path = os.getenv("PLAYWRIGHT_BROWSERS_PATH")
+    if browsers_path and browsers_path != "0":
+        directory = Path(browsers_path)
+    else:
+        directory = Path.home() / ".cache" / "ms-playwright"
+    return directory / f".dpt-chromium-ok-{version}"
+
+
+def ensure_browser_installed() -> bool:
+    """
+    Проверяет и устанавливает браузер Chromium, если он не установлен
+    
+    Проверка выполняется один раз на процесс, а успешный результат запоминается
+    в файле-отметке для текущей версии Playwright, поэтому следующие запуски
+    не запускают Chromium ради проверки. Функция блокирующая - из асинхронного
+    кода вызывайте ensure_browser_installed_async().
+    
+    Returns:
+        True, если браузер готов к работе
+    """
+    global _browser_installed
+    if _browser_installed is not None:
+        return _browser_installed
+    
+    marker = _browser_marker()
+    if marker.exists():
+        _browser_installed = True
+        return True
+    
+    _browser_installed = _check_or_install_browser()
+    if _browser_installed:
+        try:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        except OSError as e:
+            print(f"⚠ Не удалось сохранить отметку о проверке браузера: {e}")
+    return _browser_installed
+
+
+def _check_or_install_browser() -> bool:
     try:
         from playwright.sync_api import sync_playwright
         with sync_playwright() as p:
             # Пробуем запустить браузер для проверки
             browser = p.chromium.launch(headless=True)
             browser.close()
+        return True
     except Exception:
         print("Браузер Chromium не установлен. Устанавливаю...")
         import subprocess
@@ -28,194 +96,275 @@ def ensure_browser_installed():
         )
         if result.returncode == 0:
             print("✓ Браузер успешно установлен!")
-        else:
-            print(f"✗ Ошибка при установке браузера: {result.stderr}")
-            print("Попробуйте вручную выполнить: python -m playwright install chromium")
-            sys.exit(1)
+            return True
+        print(f"✗ Ошибка при установке браузера: {result.stderr}")
+        print("Попробуйте вручную выполнить: python -m playwright install chromium")
+        return False
+
+
+async def ensure_browser_installed_async() -> bool:
+    """Неблокирующая проверка браузера: выполняется в отдельном потоке, один раз на процесс"""
+    global _install_task
+    if _install_task is None:
+        _install_task = asyncio.ensure_future(asyncio.to_thread(ensure_browser_installed))
+    return await asyncio.shield(_install_task)
 
 
-def screenshot_hero(hero_name: str, output_dir: str = "screenshots", wait_time: int = 5000):
+def invalidate_browser_marker():
+    """Сбрасывает отметку о проверке, если браузер все-таки не запустился"""
+    global _browser_installed, _install_task
+    _browser_installed = None
+    _install_task = None
+    _browser_marker().unlink(missing_ok=True)
+
+
+async def open_builds_tab(page, hero_name: str, wait_time: int = 300,
+                          consent: asyncio.Event | None = None) -> dict | None:
     """
-    Делает скриншот вкладки Builds для героя с dota2protracker.com
+    Открывает страницу героя, закрывает уведомление о согласии и активирует вкладку Builds
     
     Args:
+        page: Страница Playwright (async API)
         hero_name: Название героя (например, 'mars')
-        output_dir: Директория для сохранения скриншотов
-        wait_time: Время ожидания загрузки страницы в миллисекундах
-    """
-    # Формируем URL
-    url = f"https://dota2protracker.com/hero/{hero_name.lower()}"
-    
-    # Создаем директорию для скриншотов, если её нет
-    output_path = Path(output_dir)
-    output_path.mkdir(exist_ok=True)
+        wait_time: Окно тишины в миллисекундах: контент считается готовым, когда
+            страница столько времени не менялась
+        consent: Общее для страниц одного контекста событие «согласие уже проверено».
+            Если оно установлено, уведомление не ищется сразу после загрузки,
+            но проверяется после готовности Builds (оно могло появиться позже)
     
-    # Формируем путь к файлу скриншота
-    screenshot_path = output_path / f"{hero_name.lower()}.png"
+    Returns:
+        Координаты контейнера Builds или None, если он не найден
+    """
+    url = hero_url(hero_name)
     
     print(f"Открываю страницу: {url}")
     
-    with sync_playwright() as p:
-        # Запускаем браузер (headless=False для отладки, можно поставить True)
-        browser = p.chromium.launch(headless=True)
-        
-        # Создаем новую страницу
-        page = browser.new_page()
-        
-        # Устанавливаем размер окна
-        page.set_viewport_size({"width": 1920, "height": 1080})
-        
+    # Переходим на страницу (увеличиваем таймаут и используем load вместо networkidle)
+    with span("goto"):
+        await page.goto(url, wait_until="load", timeout=30000)
+    
+    # Закрываем уведомление о согласии (cookie consent).
+    # Все селекторы проверяются одним вызовом в браузер
+    if consent is not None and consent.is_set():
+        # Согласие уже проверила другая страница этого контекста (cookies общие).
+        # Она могла и не найти уведомление, поэтому поздняя проверка ниже остается
+        consent_clicked = False
+    else:
+        print("Проверяю наличие уведомления о согласии...")
         try:
-            # Переходим на страницу (увеличиваем таймаут и используем load вместо networkidle)
-            page.goto(url, wait_until="load", timeout=30000)
-            
-            # Ждем немного для появления уведомления о cookies/GDPR
-            page.wait_for_timeout(500)
-            
-            # Закрываем уведомление о согласии (cookie consent)
-            print("Проверяю наличие уведомления о согласии...")
-            consent_selectors = [
-                'button:has-text("Consent")',
-                'button:has-text("Accept")',
-                'button:has-text("Согласиться")',
-                'button:has-text("Принять")',
-                '[id*="consent"]',
-                '[class*="consent"]',
-                '[id*="cookie"]',
-                '[class*="cookie"]',
-                'button[aria-label*="Consent"]',
-                'button[aria-label*="Accept"]',
-            ]
-            
+            with span("consent"):
+                consent_clicked = await probe_and_click(page, SELECTOR_GROUPS["consent"])
+        except Exception:
             consent_clicked = False
-            for selector in consent_selectors:
-                try:
-                    consent_button = page.locator(selector).first
-                    if consent_button.is_visible(timeout=1000):
-                        consent_button.click()
-                        print("✓ Закрыл уведомление о согласии")
-                        consent_clicked = True
-                        page.wait_for_timeout(300)  # Ждем исчезновения уведомления
-                        break
-                except:
-                    continue
-            
-            if not consent_clicked:
-                print("⚠ Уведомление о согласии не найдено (возможно, уже закрыто или отсутствует)")
-            
-            # Ждем минимальное время для загрузки контента
-            page.wait_for_timeout(300)
-            
-            # Сначала кликаем на вкладку Builds, чтобы контент стал видимым
-            print("Ищу и активирую вкладку 'Builds'...")
-            builds_tab_selectors = [
-                'button:has-text("Builds")',
-                'a:has-text("Builds")',
-                '[role="tab"]:has-text("Builds")',
-                'text="Builds"',
-                'button >> text="Builds"',
-                'a >> text="Builds"',
-            ]
-            
-            builds_tab_clicked = False
-            for selector in builds_tab_selectors:
-                try:
-                    builds_tab = page.locator(selector).first
-                    if builds_tab.is_visible(timeout=1000):
-                        builds_tab.click()
-                        print("✓ Кликнул на вкладку 'Builds'")
-                        builds_tab_clicked = True
-                        # Ждем загрузки контента вкладки
-                        page.wait_for_timeout(500)
-                        break
-                except:
-                    continue
-            
-            if not builds_tab_clicked:
-                print("⚠ Вкладка 'Builds' не найдена, пробую найти контент напрямую...")
-                page.wait_for_timeout(300)
-            
-            # Ищем контейнер с контентом вкладки Builds напрямую по классу
-            print("Ищу контент вкладки Builds...")
-            builds_element = page.locator('.flex.flex-col.gap-1').first
+        
+        if consent_clicked:
+            print("✓ Закрыл уведомление о согласии")
+        else:
+            print("⚠ Уведомление о согласии не найдено (возможно, уже закрыто или отсутствует)")
+        if consent is not None:
+            consent.set()
+    
+    # Сначала кликаем на вкладку Builds, чтобы контент стал видимым
+    print("Ищу и активирую вкладку 'Builds'...")
+    try:
+        with span("builds_tab"):
+            builds_tab_clicked = await probe_and_click(page, SELECTOR_GROUPS["builds_tab"], timeout=1000)
+    except Exception:
+        builds_tab_clicked = False
+    
+    if builds_tab_clicked:
+        print("✓ Кликнул на вкладку 'Builds'")
+    else:
+        print("⚠ Вкладка 'Builds' не найдена, пробую найти контент напрямую...")
+    
+    # Ждем, пока контейнер Builds появится и страница перестанет меняться
+    print("Ищу контент вкладки Builds...")
+    with span("builds_ready"):
+        bbox = await wait_for_builds_ready(page, quiet_ms=wait_time)
+    
+    # Уведомление о согласии могло появиться позже - проверяем еще раз (один вызов)
+    if not consent_clicked:
+        try:
+            if await probe_and_click(page, SELECTOR_GROUPS["consent"]):
+                print("✓ Закрыл появившееся позже уведомление о согласии")
+                bbox = await wait_for_builds_ready(page, quiet_ms=wait_time)
+        except Exception:
+            pass
+    
+    return bbox
+
+
+async def screenshot_hero_async(page, hero_name: str, wait_time: int = 300,
+                                consent: asyncio.Event | None = None) -> bytes | None:
+    """
+    Делает скриншот вкладки Builds для героя на уже открытой странице браузера
+    
+    Скриншот не сохраняется на диск - сохранением занимается кэш (RenderCache).
+    
+    Args:
+        page: Страница Playwright (async API), например взятая из BrowserPool
+        hero_name: Название героя (например, 'mars')
+        wait_time: Окно тишины в миллисекундах: контент считается готовым, когда
+            страница столько времени не менялась
+        consent: Событие «согласие уже обработано» (см. open_builds_tab)
+    
+    Returns:
+        PNG-изображение или None, если контент страницы не найден
+    
+    Raises:
+        Exception: Страница или браузер упали во время рендера
+    """
+    # Счетчики заблокированных и закэшированных запросов за этот рендер
+    request_stats = stats_for(page)
+    if request_stats:
+        request_stats.reset()
+    
+    try:
+        bbox = await open_builds_tab(page, hero_name, wait_time, consent)
+        
+        if bbox:
+            # Прокручиваем к элементу и ждем загрузки картинок в нем
+            with span("scroll"):
+                await scroll_and_settle(page, bbox['y'] - 100)
             
-            # Проверяем, что элемент существует в DOM
+            # Делаем скриншот области
+            with span("capture"):
+                image = await page.screenshot(
+                    clip={
+                        "x": bbox['x'],
+                        "y": bbox['y'],
+                        "width": bbox['width'],
+                        "height": bbox['height']
+                    }
+                )
+            print(f"✓ Скриншот вкладки Builds создан ({len(image) // 1024} КБ)")
+        else:
+            # Если не удалось найти конкретный элемент, пробуем найти через родительский контейнер
+            print("⚠ Контент не найден по стандартным селекторам...")
             try:
-                builds_element.wait_for(state="attached", timeout=2000)
-                print("✓ Найден контент вкладки Builds")
+                # Ищем любой контейнер с классом flex flex-col
+                parent_element = page.locator('div.flex.flex-col').first
+                if await parent_element.is_visible():
+                    with span("capture"):
+                        image = await parent_element.screenshot(timeout=2000)
+                    SCREENSHOT_FALLBACKS.inc(kind="container")
+                    print("✓ Скриншот родительского контейнера создан")
+                else:
+                    raise Exception("Родительский контейнер не найден")
             except:
-                builds_element = None
-                print("⚠ Контент вкладки Builds не найден")
-            
-            if builds_element:
-                # Используем JavaScript для получения координат элемента
-                try:
-                    # Получаем координаты через JavaScript (работает даже для скрытых элементов)
-                    bbox = page.evaluate("""() => {
-                        const element = document.querySelector('.flex.flex-col.gap-1');
-                        if (!element) return null;
-                        const rect = element.getBoundingClientRect();
-                        return {
-                            x: rect.x + window.scrollX,
-                            y: rect.y + window.scrollY,
-                            width: rect.width,
-                            height: rect.height
-                        };
-                    }""")
-                    
-                    if bbox and bbox['width'] > 0 and bbox['height'] > 0:
-                        # Прокручиваем к элементу
-                        page.evaluate(f"window.scrollTo(0, {bbox['y'] - 100})")
-                        page.wait_for_timeout(300)
-                        
-                        # Делаем скриншот области
-                        page.screenshot(
-                            path=str(screenshot_path),
-                            clip={
-                                "x": bbox['x'],
-                                "y": bbox['y'],
-                                "width": bbox['width'],
-                                "height": bbox['height']
-                            }
-                        )
-                        print(f"✓ Скриншот вкладки Builds сохранен: {screenshot_path}")
-                    else:
-                        # Если JavaScript не сработал, пробуем обычный метод
-                        builds_element.screenshot(path=str(screenshot_path))
-                        print(f"✓ Скриншот вкладки Builds сохранен: {screenshot_path}")
-                except Exception as e:
-                    print(f"⚠ Ошибка при скриншоте через JavaScript: {e}")
-                    # Пробуем обычный метод как запасной вариант
-                    try:
-                        builds_element.screenshot(path=str(screenshot_path), timeout=2000)
-                        print(f"✓ Скриншот вкладки Builds сохранен: {screenshot_path}")
-                    except:
-                        raise Exception(f"Не удалось сделать скриншот: {e}")
-            else:
-                # Если не удалось найти конкретный элемент, пробуем найти через родительский контейнер
-                print("⚠ Контент не найден по стандартным селекторам...")
-                try:
-                    # Ищем любой контейнер с классом flex flex-col
-                    parent_element = page.locator('div.flex.flex-col').first
-                    if parent_element.is_visible(timeout=1000):
-                        parent_element.screenshot(path=str(screenshot_path))
-                        print(f"✓ Скриншот родительского контейнера сохранен: {screenshot_path}")
-                    else:
-                        raise Exception("Родительский контейнер не найден")
-                except:
-                    # В крайнем случае делаем скриншот всей страницы
-                    print("⚠ Делаю скриншот всей страницы как запасной вариант...")
-                    page.screenshot(path=str(screenshot_path), full_page=True)
-                    print(f"✓ Скриншот сохранен: {screenshot_path}")
-            
-        except Exception as e:
-            print(f"✗ Ошибка при создании скриншота: {e}")
-            import traceback
-            traceback.print_exc()
-            # Не завершаем программу, просто возвращаемся - бот должен продолжать работать
-            return
+                # В крайнем случае делаем скриншот всей страницы
+                print("⚠ Делаю скриншот всей страницы как запасной вариант...")
+                with span("capture"):
+                    image = await page.screenshot(full_page=True)
+                SCREENSHOT_FALLBACKS.inc(kind="full_page")
+                print("✓ Скриншот всей страницы создан")
+        
+        return image
+        
+    except Exception as e:
+        record_error("screenshot", e)
+        print(f"✗ Ошибка при создании скриншота: {e}")
+        # Пробрасываем ошибку: пул пересоздаст страницу, а бот сообщит о сбое
+        raise
+    finally:
+        if request_stats:
+            print(f"Запросы страницы: {request_stats.summary()}")
+
+
+async def screenshot_heroes_async(pages: list, hero_names: list[str],
+                                  wait_time: int = 300) -> list[bytes | None]:
+    """
+    Делает скриншоты нескольких героев параллельно, по странице на героя
+    
+    Страницы должны принадлежать одному контексту (BrowserPool.pages): первая
+    страница закрывает уведомление о согласии, остальные стартуют сразу после
+    этого и его уже не ищут.
+    
+    Returns:
+        PNG-изображения в порядке hero_names (None - скриншот не удался,
+        ошибка уже записана в лог)
+    """
+    consent = asyncio.Event()
+    
+    async def render(page, hero_name: str, first: bool):
+        if not first:
+            await consent.wait()
+        return await screenshot_hero_async(page, hero_name, wait_time, consent)
+    
+    first = asyncio.create_task(render(pages[0], hero_names[0], True))
+    # Если первая страница упала до проверки согласия, остальные не должны ждать вечно
+    first.add_done_callback(lambda _: consent.set())
+    rest = [render(page, hero_name, False) for page, hero_name in zip(pages[1:], hero_names[1:])]
+    results = await asyncio.gather(first, *rest, return_exceptions=True)
+    return [None if isinstance(result, Exception) else result for result in results]
+
+
+async def extract_builds_async(page, hero_name: str, wait_time: int = 300) -> HeroBuilds | None:
+    """
+    Извлекает билды героя (предметы, способности, винрейт, количество матчей) как данные
+    
+    Args:
+        page: Страница Playwright (async API), например взятая из BrowserPool
+        hero_name: Название героя (например, 'mars')
+        wait_time: Окно тишины страницы в миллисекундах
+    
+    Returns:
+        HeroBuilds или None, если контейнер с билдами не найден
+    """
+    try:
+        bbox = await open_builds_tab(page, hero_name, wait_time)
+        if not bbox:
+            print("⚠ Контент вкладки Builds не найден")
+            return None
+        # Забираем только HTML контейнера - разбор выполняется без браузера
+        html = await page.evaluate(
+            "(selector) => document.querySelector(selector)?.outerHTML || ''",
+            BUILDS_SELECTOR
+        )
+    except Exception as e:
+        record_error("builds", e)
+        print(f"✗ Ошибка при извлечении билдов: {e}")
+        return None
+    
+    builds = parse_builds_html(html, hero_name)
+    print(f"✓ Извлечено билдов: {len(builds.builds)}")
+    return builds
+
+
+def screenshot_hero(hero_name: str, output_dir: str = "screenshots", wait_time: int = 300):
+    """
+    Делает скриншот вкладки Builds для героя с dota2protracker.com
+    
+    Запускает отдельный браузер на один запрос - подходит для использования
+    скрипта напрямую. Бот использует screenshot_hero_async с пулом BrowserPool.
+    
+    Args:
+        hero_name: Название героя (например, 'mars')
+        output_dir: Директория для сохранения скриншотов
+        wait_time: Окно тишины страницы в миллисекундах
+    
+    Returns:
+        Путь к сохраненному скриншоту или None
+    """
+    async def run():
+        pool = BrowserPool(size=1)
+        try:
+            async with pool.page() as page:
+                return await screenshot_hero_async(page, hero_name, wait_time)
         finally:
-            browser.close()
+            await pool.close()
+
+    image = asyncio.run(run())
+    if image is None:
+        return None
+    
+    # Создаем директорию для скриншотов, если её нет
+    output_path = Path(output_dir)
+    output_path.mkdir(exist_ok=True)
+    screenshot_path = output_path / f"{hero_name.lower()}.png"
+    screenshot_path.write_bytes(image)
+    print(f"✓ Скриншот сохранен: {screenshot_path}")
+    return screenshot_path
 
 
 def main():
@@ -224,11 +373,12 @@ def main():
     # ========================================
     HERO_NAME = "pudge"  # Название героя (например: "mars", "pudge", "invoker")
     OUTPUT_DIR = "screenshots"  # Папка для сохранения скриншотов
-    WAIT_TIME = 200  # Время ожидания загрузки страницы в миллисекундах (уменьшено для ускорения)
+    WAIT_TIME = 200  # Окно тишины страницы в миллисекундах перед скриншотом
     # ========================================
     
     # Проверяем и устанавливаем браузер при необходимости
-    ensure_browser_installed()
+    if not ensure_browser_installed():
+        sys.exit(1)
     
     screenshot_hero(HERO_NAME, OUTPUT_DIR, WAIT_TIME)
 